@@ -1,10 +1,10 @@
 # auth.py
 import os
 import time
-import bcrypt
-import jwt
 from typing import Optional
 
+# bcrypt und jwt werden erst beim ersten Login/Request importiert (schnellerer Kaltstart)
+
 # Hinweis: Für Produktion setzen wir JWT_SECRET später in Render als Environment Variable.
 JWT_SECRET = os.getenv("JWT_SECRET", "dev-secret")  # TODO: in Render setzen
 JWT_ALG = "HS256"
@@ -12,10 +12,12 @@ JWT_TTL_SECONDS = 7 * 24 * 3600  # 7 Tage
 
 def hash_pw(pw: str) -> str:
     """Erstellt einen sicheren Hash für das Passwort (bcrypt)."""
+    import bcrypt
     return bcrypt.hashpw(pw.encode("utf-8"), bcrypt.gensalt()).decode("utf-8")
 
 def check_pw(pw: str, h: str) -> bool:
     """Vergleicht Klartext-Passwort mit gespeichertem Hash."""
+    import bcrypt
     try:
         return bcrypt.checkpw(pw.encode("utf-8"), h.encode("utf-8"))
     except Exception:
@@ -23,12 +25,14 @@ def check_pw(pw: str, h: str) -> bool:
 
 def make_jwt(user_id: str) -> str:
     """Erzeugt ein kurzlebiges JWT für den eingeloggten User."""
+    import jwt
     now = int(time.time())
     payload = {"sub": user_id, "iat": now, "exp": now + JWT_TTL_SECONDS}
     return jwt.encode(payload, JWT_SECRET, algorithm=JWT_ALG)
 
 def parse_jwt(token: str) -> Optional[str]:
     """Liest ein JWT und gibt die User-ID (sub) zurück, oder None bei Fehler."""
+    import jwt
     try:
         payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALG])
         return payload.get("sub")
@@ -0,0 +1,41 @@
+# calendar_token.py
+#
+# Erzeugt (oder erneuert) den geheimen Token für den Kalender-Feed einer Praxis
+# und gibt die Abo-URL aus. Ein neuer Token macht die alte URL ungültig.
+#
+#   python calendar_token.py <practice_id> [--rotate] [--base-url https://api.example.de]
+import argparse
+import secrets
+
+from database import engine, SessionLocal
+from models import Practice, migrate_schema
+
+
+def ensure_calendar_token(db, practice: Practice, rotate: bool = False) -> str:
+    if rotate or not practice.calendar_token:
+        practice.calendar_token = secrets.token_urlsafe(32)
+        db.commit()
+    return practice.calendar_token
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("practice_id")
+    parser.add_argument("--rotate", action="store_true")
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    args = parser.parse_args()
+
+    migrate_schema(engine)
+    db = SessionLocal()
+    try:
+        p = db.query(Practice).filter(Practice.id == args.practice_id).first()
+        if not p:
+            raise SystemExit(f"Praxis {args.practice_id} nicht gefunden")
+        token = ensure_calendar_token(db, p, rotate=args.rotate)
+        print(f"{args.base_url}/practice/{p.id}/calendar.ics?token={token}")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+# check_importtime.py
+#
+# Startup-Budget prüfen: misst `import main` mit `python -X importtime`
+# und schlägt fehl, wenn das Budget überschritten wird oder Module, die
+# lazy geladen werden sollen, schon beim Import auftauchen.
+#
+#   python check_importtime.py            # Budget aus IMPORT_BUDGET_MS (Default 800)
+#   python check_importtime.py --budget 900 --top 20 --runs 5
+#
+# Gemessen ~650 ms; gewertet wird der schnellste von --runs Läufen, damit
+# Rauschen (andere Prozesse, kalter Cache) den knappen Puffer nicht auffrisst.
+# Läuft als Test mit (tests/test_app.py).
+import argparse
+import os
+import subprocess
+import sys
+from typing import Optional
+
+# werden erst bei Bedarf importiert (siehe auth.py, mailer.py, Kalender-Endpunkt)
+LAZY_MODULES = ("bcrypt", "jwt", "smtplib", "ical")
+
+
+def measure(module: str = "main") -> dict[str, tuple[int, int]]:
+    """Liefert {modul: (self_us, cumulative_us)} für einen frischen Interpreter."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+    )
+    if proc.returncode != 0:
+        sys.stderr.write(proc.stderr)
+        raise SystemExit(proc.returncode)
+    timings = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cum_us, name = line[len("import time:"):].split("|")
+        timings[name.strip()] = (int(self_us), int(cum_us))
+    return timings
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--budget", type=float, default=float(os.getenv("IMPORT_BUDGET_MS", "800")))
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    timings = min((measure() for _ in range(max(1, args.runs))), key=lambda t: t["main"][1])
+    total_ms = timings["main"][1] / 1000
+    print(f"import main: {total_ms:.1f} ms (Budget {args.budget:.0f} ms)")
+    print("Teuerste Module (kumulativ):")
+    top = sorted(timings.items(), key=lambda kv: kv[1][1], reverse=True)[: args.top]
+    for name, (_, cum_us) in top:
+        print(f"  {cum_us / 1000:8.1f} ms  {name}")
+
+    failed = False
+    eager = [m for m in LAZY_MODULES if m in timings]
+    if eager:
+        print(f"FEHLER: sollten lazy geladen werden: {', '.join(eager)}")
+        failed = True
+    if total_ms > args.budget:
+        print("FEHLER: Import-Budget überschritten")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
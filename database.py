@@ -1,17 +1,206 @@
 import os
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
+import time
+import itertools
+import threading
+from typing import Optional, Sequence
+from fastapi import Request
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session, sessionmaker, declarative_base
 
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./app.db")
-connect_args = {"check_same_thread": False} if DATABASE_URL.startswith("sqlite") else {}
-engine = create_engine(DATABASE_URL, echo=False, future=True, connect_args=connect_args)
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine, future=True)
+# Read-Replikas: kommagetrennte Liste von DB-URLs (leer = alles über den Primary)
+REPLICA_HEALTH_TTL_SECONDS = float(os.getenv("REPLICA_HEALTH_TTL_SECONDS", "5"))
+# Cookie, das nach einem Schreibzugriff Lesezugriffe kurz auf den Primary lenkt
+STICKY_COOKIE = "db_primary_until"
+# Replika nicht erreichbar (z.B. Pakete werden verworfen): nicht bis zum TCP-Timeout des OS warten
+REPLICA_CONNECT_TIMEOUT_SECONDS = float(os.getenv("REPLICA_CONNECT_TIMEOUT_SECONDS", "2"))
+# Health-Probe: muss das Schema berühren, sonst gilt eine leere/halb migrierte Replika als gesund
+REPLICA_PROBE_SQL = "SELECT 1 FROM practices LIMIT 1"
+
+
+def make_engine(url: str, connect_timeout: Optional[float] = None, **kw):
+    connect_args = {"check_same_thread": False} if url.startswith("sqlite") else {}
+    if connect_timeout is not None:
+        connect_args.update(timeout_connect_args(url, connect_timeout))
+    return create_engine(url, echo=False, future=True, connect_args=connect_args, **kw)
+
+
+def timeout_connect_args(url: str, seconds: float) -> dict:
+    """Treiber-spezifische Verbindungs-Timeouts."""
+    if url.startswith("postgresql"):
+        return {"connect_timeout": max(1, int(seconds))}  # libpq: ganze Sekunden
+    if url.startswith("sqlite"):
+        return {"timeout": seconds}  # Warten auf Sperren
+    return {}
+
+
+def make_sessionmaker(bind, **kw) -> sessionmaker:
+    return sessionmaker(autocommit=False, autoflush=False, bind=bind, future=True, **kw)
+
+
+def _reject_flush(session, flush_context, instances):
+    raise RuntimeError("Read-only Session: Schreibzugriffe bitte über get_db")
+
+
+class ReplicaSession(Session):
+    """Session auf einer Replika: schlägt eine Abfrage mit OperationalError fehl,
+    wird die Replika als down markiert und die Abfrage einmal auf dem Primary wiederholt.
+    """
+
+    def execute(self, statement, *args, **kw):
+        try:
+            return super().execute(statement, *args, **kw)
+        except OperationalError:
+            fallback = self.info.pop("fallback", None)
+            if fallback is None:
+                raise
+            router, idx = fallback
+            router.mark_down(idx)
+            self.rollback()
+            self.bind = router.primary_engine
+            return super().execute(statement, *args, **kw)
+
+
+def make_read_sessionmaker(bind, **kw) -> sessionmaker:
+    """Sessions, die nicht schreiben dürfen (flush wirft einen Fehler)."""
+    factory = make_sessionmaker(bind, **kw)
+    event.listen(factory, "before_flush", _reject_flush)
+    return factory
+
+
+# Default-Engine für seed.py und Skripte; die App bekommt ihre eigene über create_app()
+engine = make_engine(DATABASE_URL)
+SessionLocal = make_sessionmaker(engine)
 Base = declarative_base()
 
-def get_db():
-    db = SessionLocal()
+
+class ReadRouter:
+    """Verteilt Lesezugriffe round-robin auf die Replikas.
+
+    Der Zustand jeder Replika wird höchstens alle REPLICA_HEALTH_TTL_SECONDS
+    per REPLICA_PROBE_SQL geprüft – immer nur von einem Request, die übrigen
+    nutzen derweil den letzten bekannten Zustand. Fällt eine aus (oder sind keine
+    konfiguriert), wird vom Primary gelesen. Scheitert trotzdem eine Abfrage auf der Replika,
+    wiederholt ReplicaSession sie auf dem Primary.
+    """
+
+    def __init__(self, primary_engine, replica_urls: Sequence[str] = (), health_ttl: float = REPLICA_HEALTH_TTL_SECONDS):
+        self.primary_engine = primary_engine
+        self.primary = make_read_sessionmaker(primary_engine)
+        self.engines = [
+            make_engine(url, connect_timeout=REPLICA_CONNECT_TIMEOUT_SECONDS, pool_pre_ping=True)
+            for url in replica_urls
+        ]
+        self.replicas = [
+            make_read_sessionmaker(e, class_=ReplicaSession, info={"fallback": (self, i)})
+            for i, e in enumerate(self.engines)
+        ]
+        self.health_ttl = health_ttl
+        self._healthy = [True] * len(self.engines)
+        self._checked_at = [0.0] * len(self.engines)
+        self._probing = [threading.Lock() for _ in self.engines]
+        self._rr = itertools.count()
+        self._lock = threading.Lock()
+
+    def _probe(self, i: int) -> bool:
+        try:
+            with self.engines[i].connect() as con:
+                con.execute(text(REPLICA_PROBE_SQL))
+            return True
+        except Exception:
+            return False
+
+    def is_healthy(self, i: int) -> bool:
+        if time.monotonic() - self._checked_at[i] < self.health_ttl:
+            return self._healthy[i]
+        # single-flight: läuft schon eine Probe, nicht warten, sondern den alten Stand nehmen
+        if not self._probing[i].acquire(blocking=False):
+            return self._healthy[i]
+        try:
+            if time.monotonic() - self._checked_at[i] < self.health_ttl:
+                return self._healthy[i]  # gerade von einem anderen Request geprüft
+            healthy = self._probe(i)
+            with self._lock:
+                self._healthy[i] = healthy
+                self._checked_at[i] = time.monotonic()
+        finally:
+            self._probing[i].release()
+        return healthy
+
+    def mark_down(self, i: int) -> None:
+        with self._lock:
+            self._healthy[i] = False
+            self._checked_at[i] = time.monotonic()
+
+    def pick(self) -> tuple[Optional[int], sessionmaker]:
+        """-> (Replika-Index oder None für den Primary, Session-Factory)."""
+        n = len(self.replicas)
+        for _ in range(n):
+            i = next(self._rr) % n
+            if self.is_healthy(i):
+                return i, self.replicas[i]
+        return None, self.primary
+
+    def status(self) -> list[bool]:
+        return [self.is_healthy(i) for i in range(len(self.engines))]
+
+
+def get_db(request: Request):
+    db = request.app.state.SessionLocal()
     try:
         yield db
     finally:
         db.close()
+
+
+def is_sticky(request: Request) -> bool:
+    try:
+        return float(request.cookies.get(STICKY_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+
+def get_read_db(request: Request):
+    """Read-only Session für reine Lese-Endpunkte (Replika, sonst Primary).
+
+    Kurz nach einem eigenen Schreibzugriff (Cookie, siehe ReadYourWritesMiddleware)
+    wird vom Primary gelesen, damit die eigene Buchung sofort sichtbar ist.
+    """
+    router: ReadRouter = request.app.state.read_router
+    factory = router.primary if is_sticky(request) else router.pick()[1]
+    # z.B. für Streaming-Antworten, die nach dem Request eine eigene Session brauchen
+    request.state.read_factory = factory
+    db = factory()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+class ReadYourWritesMiddleware:
+    """Setzt nach erfolgreichen Schreib-Requests das Sticky-Cookie (ASGI-Middleware)."""
+
+    WRITE_METHODS = {"POST", "PUT", "PATCH", "DELETE"}
+
+    def __init__(self, app, sticky_seconds: int = 10):
+        self.app = app
+        self.sticky_seconds = sticky_seconds
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] not in self.WRITE_METHODS:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_cookie(message):
+            if message["type"] == "http.response.start" and message["status"] < 400:
+                until = int(time.time()) + self.sticky_seconds
+                cookie = (
+                    f"{STICKY_COOKIE}={until}; Max-Age={self.sticky_seconds}; Path=/; "
+                    "HttpOnly; Secure; SameSite=None"
+                )
+                message = {**message, "headers": [*message.get("headers", []), (b"set-cookie", cookie.encode("latin-1"))]}
+            await send(message)
+
+        await self.app(scope, receive, send_with_cookie)
@@ -0,0 +1,140 @@
+# ical.py
+#
+# iCalendar-Feed (.ics) für die Termine einer Praxis.
+# Die Termine werden über einen serverseitigen Cursor gestreamt (yield_per),
+# der Speicherbedarf bleibt also unabhängig von der Anzahl der Termine konstant.
+import hashlib
+from datetime import datetime
+from typing import Iterator, Optional
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session, sessionmaker
+
+from models import Appointment, Practice, Service
+
+STREAM_BATCH_SIZE = 500
+PRODID = "-//PraxisNow//Kalender//DE"
+
+
+def _filtered(query, practice_id: str, resource_id: Optional[str], since: Optional[datetime]):
+    query = query.filter(Appointment.practice_id == practice_id)
+    if resource_id:
+        query = query.filter(Appointment.resource_id == resource_id)
+    if since is not None:
+        # inkrementell: auch Stornos liefern, damit der Client sie entfernt
+        query = query.filter(Appointment.updated_at > since)
+    else:
+        query = query.filter(Appointment.status == "BOOKED")
+    return query
+
+
+def feed_version(
+    db: Session,
+    practice_id: str,
+    resource_id: Optional[str] = None,
+    since: Optional[datetime] = None,
+) -> tuple[str, Optional[datetime]]:
+    """Liefert (ETag, Last-Modified) für den Feed.
+
+    Basis ist max(updated_at) über alle Termine der Praxis, egal welcher Status:
+    ein Storno erhöht den Wert (statt den Termin aus dem Aggregat fallen zu lassen),
+    und die Abfrage ist ein einziger Seek auf ix_appointments_practice_updated.
+    resource_id/since gehen nur in den ETag ein – ein Feed pro Ressource wird bei
+    Änderungen an anderen Ressourcen der Praxis mit invalidiert.
+    """
+    last_modified = (
+        db.query(func.max(Appointment.updated_at))
+        .filter(Appointment.practice_id == practice_id)
+        .scalar()
+    )
+    key = f"{practice_id}|{resource_id}|{since}|{last_modified}"
+    etag = '"' + hashlib.sha1(key.encode("utf-8")).hexdigest() + '"'
+    return etag, last_modified
+
+
+def _escape(value: str) -> str:
+    return (
+        value.replace("\\", "\\\\")
+        .replace(";", "\\;")
+        .replace(",", "\\,")
+        .replace("\n", "\\n")
+    )
+
+
+def _fold(line: str) -> str:
+    """Faltet Zeilen nach RFC 5545 auf max. 75 Oktette."""
+    raw = line.encode("utf-8")
+    if len(raw) <= 75:
+        return line + "\r\n"
+    parts = []
+    while len(raw) > 75:
+        cut = 75 if not parts else 74
+        # nicht mitten in einem UTF-8-Zeichen trennen
+        while cut > 0 and (raw[cut] & 0xC0) == 0x80:
+            cut -= 1
+        parts.append(raw[:cut].decode("utf-8"))
+        raw = raw[cut:]
+    parts.append(raw.decode("utf-8"))
+    return "\r\n ".join(parts) + "\r\n"
+
+
+def _ts(dt: datetime) -> str:
+    return dt.strftime("%Y%m%dT%H%M%SZ")
+
+
+def stream_ics(
+    session_factory: sessionmaker,
+    practice_id: str,
+    resource_id: Optional[str] = None,
+    since: Optional[datetime] = None,
+) -> Iterator[str]:
+    """Generator für den .ics-Feed. Öffnet eine eigene Session, weil er erst
+    nach dem Ende des Requests (und der get_db-Session) konsumiert wird."""
+    db = session_factory()
+    try:
+        practice = db.query(Practice).filter(Practice.id == practice_id).first()
+        yield "BEGIN:VCALENDAR\r\n"
+        yield "VERSION:2.0\r\n"
+        yield f"PRODID:{PRODID}\r\n"
+        yield "CALSCALE:GREGORIAN\r\n"
+        yield "METHOD:PUBLISH\r\n"
+        if practice:
+            yield _fold(f"X-WR-CALNAME:{_escape(practice.name)}")
+            yield _fold(f"X-WR-TIMEZONE:{practice.time_zone}")
+
+        rows = _filtered(
+            db.query(
+                Appointment.id,
+                Appointment.start_ts_utc,
+                Appointment.end_ts_utc,
+                Appointment.status,
+                Appointment.patient_name,
+                Appointment.updated_at,
+                Service.name,
+            ).join(Service, Service.id == Appointment.service_id),
+            practice_id, resource_id, since,
+        ).order_by(Appointment.start_ts_utc.asc())
+        rows = rows.execution_options(stream_results=True).yield_per(STREAM_BATCH_SIZE)
+
+        now = _ts(datetime.utcnow())
+        for appt_id, start, end, status, patient_name, updated_at, service_name in rows:
+            summary = service_name if not patient_name else f"{service_name} – {patient_name}"
+            lines = [
+                "BEGIN:VEVENT\r\n",
+                _fold(f"UID:{appt_id}@praxisnow"),
+                f"DTSTAMP:{now}\r\n",
+                f"DTSTART:{_ts(start)}\r\n",
+                f"DTEND:{_ts(end)}\r\n",
+            ]
+            if updated_at:
+                lines.append(f"LAST-MODIFIED:{_ts(updated_at)}\r\n")
+            lines += [
+                _fold(f"SUMMARY:{_escape(summary)}"),
+                f"STATUS:{'CANCELLED' if status == 'CANCELLED' else 'CONFIRMED'}\r\n",
+                "END:VEVENT\r\n",
+            ]
+            # ein Chunk pro Termin
+            yield "".join(lines)
+        yield "END:VCALENDAR\r\n"
+    finally:
+        db.close()
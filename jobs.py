@@ -0,0 +1,496 @@
+# jobs.py
+#
+# In-Process Hintergrund-Jobs für Nebenwirkungen rund um Buchungen
+# (Bestätigungsmails, Praxis-Benachrichtigungen, Erinnerungen).
+# Die Queue liegt in einer eigenen SQLite-Datei und überlebt Neustarts.
+import os
+import json
+import time
+import sqlite3
+import logging
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Callable, NamedTuple, Optional, Sequence
+from zoneinfo import ZoneInfo
+
+from sqlalchemy.orm import Session, sessionmaker
+
+from database import SessionLocal
+from mailer import get_mail_sink
+from models import Appointment, Practice, Service, WaitlistEntry
+import waitlist
+
+log = logging.getLogger("praxisnow.jobs")
+
+JOBS_DB_PATH = os.getenv("JOBS_DB_PATH", "./jobs.db")
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "5"))
+JOB_BACKOFF_SECONDS = float(os.getenv("JOB_BACKOFF_SECONDS", "5"))
+JOB_POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", "1"))
+# ein RUNNING-Job gilt erst nach Ablauf dieses Leases als verwaist (Worker abgestürzt)
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "300"))
+# FAILED-Jobs so lange zur Diagnose aufheben, erledigte werden sofort gelöscht
+JOB_RETENTION_DAYS = float(os.getenv("JOB_RETENTION_DAYS", "7"))
+JOB_HOUSEKEEPING_SECONDS = float(os.getenv("JOB_HOUSEKEEPING_SECONDS", "60"))
+REMINDER_LEAD_HOURS = int(os.getenv("REMINDER_LEAD_HOURS", "24"))
+
+
+class JobSpec(NamedTuple):
+    kind: str
+    payload: dict
+    run_at: Optional[datetime] = None
+    dedupe_key: Optional[str] = None
+
+
+class JobQueue:
+    """Dauerhafte Job-Queue auf SQLite-Basis.
+
+    Jede Operation öffnet eine eigene Verbindung, damit mehrere Worker-Threads
+    gefahrlos parallel arbeiten können. `claim()` reserviert einen Job atomar
+    über `BEGIN IMMEDIATE`.
+    """
+
+    def __init__(self, path: str = JOBS_DB_PATH):
+        # Datei und Tabelle entstehen erst beim ersten Zugriff (billiges create_app)
+        self.path = path
+        self._ready = False
+        self._schema_lock = threading.Lock()
+
+    def _ensure_schema(self, con: sqlite3.Connection) -> None:
+        con.execute("PRAGMA journal_mode=WAL")
+        con.execute(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                kind TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                dedupe_key TEXT,
+                status TEXT NOT NULL DEFAULT 'PENDING',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                run_at REAL NOT NULL,
+                last_error TEXT,
+                claimed_at REAL,
+                created_at REAL NOT NULL
+            )
+            """
+        )
+        cols = {row[1] for row in con.execute("PRAGMA table_info(jobs)")}
+        if "claimed_at" not in cols:
+            con.execute("ALTER TABLE jobs ADD COLUMN claimed_at REAL")
+        con.execute("CREATE INDEX IF NOT EXISTS ix_jobs_due ON jobs (status, run_at)")
+        con.execute("CREATE INDEX IF NOT EXISTS ix_jobs_dedupe ON jobs (dedupe_key)")
+
+    @contextmanager
+    def _connect(self):
+        con = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        try:
+            if not self._ready:
+                with self._schema_lock:
+                    if not self._ready:
+                        self._ensure_schema(con)
+                        self._ready = True
+            yield con
+        finally:
+            con.close()
+
+    def enqueue(
+        self,
+        kind: str,
+        payload: dict,
+        run_at: Optional[datetime] = None,
+        dedupe_key: Optional[str] = None,
+    ) -> int:
+        """Legt einen Job an. Ein offener Job mit gleichem dedupe_key wird ersetzt."""
+        return self.submit([JobSpec(kind, payload, run_at, dedupe_key)])[0]
+
+    def cancel(self, dedupe_key: str) -> None:
+        """Verwirft offene Jobs mit diesem dedupe_key (z.B. Erinnerung bei Storno)."""
+        self.submit([], cancel=[dedupe_key])
+
+    def submit(self, specs: Sequence["JobSpec"], cancel: Sequence[str] = ()) -> list[int]:
+        """Verwirft offene Jobs zu `cancel` und legt `specs` an – eine Verbindung,
+        eine Transaktion (statt eines BEGIN IMMEDIATE pro Job)."""
+        now = time.time()
+        ids = []
+        with self._connect() as con:
+            con.execute("BEGIN IMMEDIATE")
+            try:
+                for key in [*cancel, *(s.dedupe_key for s in specs if s.dedupe_key)]:
+                    con.execute("DELETE FROM jobs WHERE dedupe_key = ? AND status = 'PENDING'", (key,))
+                for s in specs:
+                    due = s.run_at.replace(tzinfo=ZoneInfo("UTC")).timestamp() if s.run_at else now
+                    cur = con.execute(
+                        "INSERT INTO jobs (kind, payload, dedupe_key, run_at, created_at) VALUES (?, ?, ?, ?, ?)",
+                        (s.kind, json.dumps(s.payload), s.dedupe_key, due, now),
+                    )
+                    ids.append(cur.lastrowid)
+                con.execute("COMMIT")
+            except BaseException:
+                con.execute("ROLLBACK")
+                raise
+        return ids
+
+    def claim(self) -> Optional[tuple[int, str, dict, int]]:
+        """Reserviert den ältesten fälligen Job -> (id, kind, payload, attempts)."""
+        with self._connect() as con:
+            con.execute("BEGIN IMMEDIATE")
+            row = con.execute(
+                "SELECT id, kind, payload, attempts FROM jobs "
+                "WHERE status = 'PENDING' AND run_at <= ? ORDER BY run_at, id LIMIT 1",
+                (time.time(),),
+            ).fetchone()
+            if not row:
+                con.execute("COMMIT")
+                return None
+            con.execute(
+                "UPDATE jobs SET status = 'RUNNING', attempts = attempts + 1, claimed_at = ? WHERE id = ?",
+                (time.time(), row[0]),
+            )
+            con.execute("COMMIT")
+            return row[0], row[1], json.loads(row[2]), row[3] + 1
+
+    def complete(self, job_id: int) -> None:
+        """Erledigte Jobs werden gelöscht, damit jobs.db nicht mit jeder Buchung wächst."""
+        with self._connect() as con:
+            con.execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+
+    def fail(self, job_id: int, attempts: int, error: str) -> None:
+        """Plant einen Retry mit exponentiellem Backoff oder markiert den Job als FAILED."""
+        with self._connect() as con:
+            if attempts >= JOB_MAX_ATTEMPTS:
+                con.execute(
+                    "UPDATE jobs SET status = 'FAILED', last_error = ? WHERE id = ?",
+                    (error, job_id),
+                )
+            else:
+                delay = JOB_BACKOFF_SECONDS * (2 ** (attempts - 1))
+                con.execute(
+                    "UPDATE jobs SET status = 'PENDING', run_at = ?, last_error = ? WHERE id = ?",
+                    (time.time() + delay, error, job_id),
+                )
+
+    def requeue_stale(self, lease_seconds: float = JOB_LEASE_SECONDS) -> int:
+        """Jobs freigeben, deren Worker den Lease überschritten hat (Absturz).
+
+        Jobs, die ein anderer, noch laufender Prozess gerade bearbeitet, bleiben
+        unangetastet – sonst gingen z.B. Bestätigungsmails doppelt raus.
+        """
+        with self._connect() as con:
+            cur = con.execute(
+                "UPDATE jobs SET status = 'PENDING' "
+                "WHERE status = 'RUNNING' AND (claimed_at IS NULL OR claimed_at < ?)",
+                (time.time() - lease_seconds,),
+            )
+            return cur.rowcount
+
+    def prune(self, retention_days: float = JOB_RETENTION_DAYS) -> int:
+        """Löscht FAILED-Jobs (und DONE aus älteren Versionen) nach Ablauf der Aufbewahrung."""
+        with self._connect() as con:
+            cur = con.execute(
+                "DELETE FROM jobs WHERE status IN ('DONE', 'FAILED') AND COALESCE(claimed_at, created_at) < ?",
+                (time.time() - retention_days * 86400,),
+            )
+            return cur.rowcount
+
+    def counts(self) -> dict[str, int]:
+        with self._connect() as con:
+            rows = con.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return {status: n for status, n in rows}
+
+
+# ---------------------------------------------
+# Handler-Registry
+# ---------------------------------------------
+HANDLERS: dict[str, Callable[[Session, dict, "JobRunner"], None]] = {}
+
+
+def job(kind: str):
+    """Registriert eine Funktion als Handler für Jobs der Art `kind`."""
+    def register(fn):
+        HANDLERS[kind] = fn
+        return fn
+    return register
+
+
+def _local_str(ts_utc: datetime, time_zone: Optional[str]) -> str:
+    tz = ZoneInfo(time_zone or "Europe/Berlin")
+    return ts_utc.replace(tzinfo=ZoneInfo("UTC")).astimezone(tz).strftime("%d.%m.%Y %H:%M")
+
+
+def _load(db, appointment_id: str):
+    appt = db.query(Appointment).filter(Appointment.id == appointment_id).first()
+    if not appt:
+        return None, None, None
+    p = db.query(Practice).filter(Practice.id == appt.practice_id).first()
+    s = db.query(Service).filter(Service.id == appt.service_id).first()
+    return appt, p, s
+
+
+@job("send_confirmation")
+def send_confirmation(db: Session, payload: dict, runner: "JobRunner") -> None:
+    appt, p, s = _load(db, payload["appointment_id"])
+    if not appt or not appt.patient_email:
+        return
+    when = _local_str(appt.start_ts_utc, p.time_zone if p else None)
+    runner.mail_sink.send(
+        appt.patient_email,
+        "Terminbestätigung",
+        f"Hallo {appt.patient_name or ''},\n\n"
+        f"Ihr Termin ({s.name if s else 'Termin'}) bei {p.name if p else 'der Praxis'} "
+        f"am {when} ist bestätigt.",
+    )
+
+
+@job("send_cancellation")
+def send_cancellation(db: Session, payload: dict, runner: "JobRunner") -> None:
+    appt, p, _ = _load(db, payload["appointment_id"])
+    if not appt or not appt.patient_email:
+        return
+    when = _local_str(appt.start_ts_utc, p.time_zone if p else None)
+    runner.mail_sink.send(
+        appt.patient_email,
+        "Termin storniert",
+        f"Ihr Termin bei {p.name if p else 'der Praxis'} am {when} wurde storniert.",
+    )
+
+
+_EVENT_LABELS = {"BOOKED": "gebucht", "CANCELLED": "storniert", "RESCHEDULED": "verschoben"}
+
+
+@job("notify_practice")
+def notify_practice(db: Session, payload: dict, runner: "JobRunner") -> None:
+    appt, p, s = _load(db, payload["appointment_id"])
+    if not appt or not p or not p.email:
+        return
+    when = _local_str(appt.start_ts_utc, p.time_zone)
+    runner.mail_sink.send(
+        p.email,
+        f"Termin {_EVENT_LABELS.get(payload.get('event'), 'geändert')}: {when}",
+        f"{appt.patient_name or appt.patient_email} – {s.name if s else ''} am {when} "
+        f"(Status: {appt.status}).",
+    )
+
+
+@job("send_reminder")
+def send_reminder(db: Session, payload: dict, runner: "JobRunner") -> None:
+    appt, p, s = _load(db, payload["appointment_id"])
+    # Termin storniert oder verschoben -> diese Erinnerung ist hinfällig
+    if not appt or appt.status != "BOOKED" or not appt.patient_email:
+        return
+    if appt.start_ts_utc.isoformat() != payload["start_ts_utc"]:
+        return
+    when = _local_str(appt.start_ts_utc, p.time_zone if p else None)
+    runner.mail_sink.send(
+        appt.patient_email,
+        "Erinnerung an Ihren Termin",
+        f"Zur Erinnerung: {s.name if s else 'Ihr Termin'} bei {p.name if p else 'der Praxis'} am {when}.",
+    )
+
+
+@job("send_waitlist_offer")
+def send_waitlist_offer(db: Session, payload: dict, runner: "JobRunner") -> None:
+    entry = db.query(WaitlistEntry).filter(WaitlistEntry.id == payload["entry_id"]).first()
+    if not entry or entry.status != "OFFERED":
+        return
+    p = db.query(Practice).filter(Practice.id == entry.practice_id).first()
+    tz = p.time_zone if p else None
+    runner.mail_sink.send(
+        entry.patient_email,
+        "Ein Termin ist frei geworden",
+        f"Hallo {entry.patient_name},\n\n"
+        f"bei {p.name if p else 'der Praxis'} ist am {_local_str(entry.offer_start_ts_utc, tz)} "
+        f"ein Termin frei geworden. Das Angebot gilt bis {_local_str(entry.offer_expires_at, tz)} "
+        f"(Wartelisten-Eintrag {entry.id}).",
+    )
+
+
+@job("expire_waitlist_offer")
+def expire_waitlist_offer(db: Session, payload: dict, runner: "JobRunner") -> None:
+    entry = db.query(WaitlistEntry).filter(WaitlistEntry.id == payload["entry_id"]).first()
+    # schon angenommen/abgelehnt oder inzwischen ein neues Angebot
+    if not entry or entry.status != "OFFERED":
+        return
+    if entry.offer_start_ts_utc.isoformat() != payload["offer_start_ts_utc"]:
+        return
+    nxt = waitlist.release_offer(db, entry)
+    db.commit()
+    on_waitlist_result(runner.queue, db, nxt)
+
+
+# ---------------------------------------------
+# Worker
+# ---------------------------------------------
+class JobRunner:
+    """Startet N Worker-Threads, die fällige Jobs aus der Queue abarbeiten.
+
+    Jeder Job bekommt eine eigene Session aus `session_factory`; Handler
+    erreichen Queue und Mail-Sink über den Runner.
+    """
+
+    def __init__(
+        self,
+        queue: JobQueue,
+        session_factory: sessionmaker = SessionLocal,
+        workers: int = JOB_WORKERS,
+        poll_seconds: float = JOB_POLL_SECONDS,
+        mail_sink=None,
+    ):
+        self.queue = queue
+        self.session_factory = session_factory
+        self.mail_sink = mail_sink or get_mail_sink()
+        self.workers = workers
+        self.poll_seconds = poll_seconds
+        self._stop = threading.Event()
+        self._threads: list[threading.Thread] = []
+        self._housekeeping_at = 0.0
+        self._housekeeping_lock = threading.Lock()
+
+    def run_one(self) -> bool:
+        """Führt höchstens einen fälligen Job aus. False, wenn nichts fällig war."""
+        claimed = self.queue.claim()
+        if not claimed:
+            return False
+        job_id, kind, payload, attempts = claimed
+        handler = HANDLERS.get(kind)
+        db = self.session_factory()
+        try:
+            if handler is None:
+                raise LookupError(f"Kein Handler für Job-Art '{kind}'")
+            handler(db, payload, self)
+        except Exception as e:
+            log.warning("Job %s (%s) fehlgeschlagen, Versuch %s: %s", job_id, kind, attempts, e)
+            self.queue.fail(job_id, attempts, repr(e))
+        else:
+            self.queue.complete(job_id)
+        finally:
+            db.close()
+        return True
+
+    def run_pending(self) -> int:
+        """Arbeitet alle aktuell fälligen Jobs synchron ab (praktisch für Tests)."""
+        n = 0
+        while self.run_one():
+            n += 1
+        return n
+
+    def housekeeping(self) -> None:
+        """Verwaiste Jobs zurückholen und alte Jobs löschen (höchstens alle JOB_HOUSEKEEPING_SECONDS)."""
+        with self._housekeeping_lock:
+            if time.monotonic() - self._housekeeping_at < JOB_HOUSEKEEPING_SECONDS:
+                return
+            self._housekeeping_at = time.monotonic()
+        self.queue.requeue_stale()
+        self.queue.prune()
+
+    def _loop(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self.housekeeping()
+                if not self.run_one():
+                    self._stop.wait(self.poll_seconds)
+            except Exception:
+                log.exception("Job-Worker Fehler")
+                self._stop.wait(self.poll_seconds)
+
+    def start(self) -> None:
+        self._stop.clear()
+        for i in range(self.workers):
+            t = threading.Thread(target=self._loop, name=f"job-worker-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def stop(self, timeout: float = 5) -> None:
+        self._stop.set()
+        for t in self._threads:
+            t.join(timeout)
+        self._threads = []
+
+
+# ---------------------------------------------
+# Einstiegspunkte für die Endpunkte
+# ---------------------------------------------
+def _submit(q: JobQueue, specs: Sequence[JobSpec], cancel: Sequence[str] = ()) -> None:
+    """Reicht Jobs nach dem Commit ein. Die Buchung ist dann schon gespeichert:
+    ist jobs.db gesperrt/nicht beschreibbar, wird nur geloggt, damit der Client
+    trotzdem seine Antwort bekommt (statt 500 und einem 409 beim Retry)."""
+    try:
+        q.submit(specs, cancel)
+    except (sqlite3.Error, OSError):
+        log.exception(
+            "Jobs nicht eingereiht: %s (verworfen: %s)",
+            [(s.kind, s.payload) for s in specs], list(cancel),
+        )
+
+
+def _reminder(appt: Appointment) -> Optional[JobSpec]:
+    """Erinnerung REMINDER_LEAD_HOURS vor Terminbeginn (None, wenn schon zu spät)."""
+    run_at = appt.start_ts_utc - timedelta(hours=REMINDER_LEAD_HOURS)
+    if run_at <= datetime.utcnow():
+        return None
+    return JobSpec(
+        "send_reminder",
+        {"appointment_id": appt.id, "start_ts_utc": appt.start_ts_utc.isoformat()},
+        run_at=run_at,
+        dedupe_key=f"reminder:{appt.id}",
+    )
+
+
+def _with_reminder(q: JobQueue, appt: Appointment, specs: list[JobSpec]) -> None:
+    """Plant (oder ersetzt) die Erinnerung zusammen mit `specs`."""
+    reminder = _reminder(appt)
+    if reminder:
+        _submit(q, [*specs, reminder])
+    else:
+        _submit(q, specs, cancel=[f"reminder:{appt.id}"])
+
+
+def schedule_reminder(q: JobQueue, appt: Appointment) -> None:
+    """Plant (oder ersetzt) die Erinnerung REMINDER_LEAD_HOURS vor Terminbeginn."""
+    _with_reminder(q, appt, [])
+
+
+def on_booked(q: JobQueue, appt: Appointment) -> None:
+    _with_reminder(q, appt, [
+        JobSpec("send_confirmation", {"appointment_id": appt.id}),
+        JobSpec("notify_practice", {"appointment_id": appt.id, "event": "BOOKED"}),
+    ])
+
+
+def on_cancelled(q: JobQueue, appt: Appointment) -> None:
+    _submit(q, [
+        JobSpec("send_cancellation", {"appointment_id": appt.id}),
+        JobSpec("notify_practice", {"appointment_id": appt.id, "event": "CANCELLED"}),
+    ], cancel=[f"reminder:{appt.id}"])
+
+
+def on_rescheduled(q: JobQueue, appt: Appointment) -> None:
+    _with_reminder(q, appt, [
+        JobSpec("send_confirmation", {"appointment_id": appt.id}),
+        JobSpec("notify_practice", {"appointment_id": appt.id, "event": "RESCHEDULED"}),
+    ])
+
+
+def cancel_waitlist_offer(q: JobQueue, entry_id: str) -> None:
+    """Ablauf-Job eines angenommenen/abgelehnten Angebots verwerfen."""
+    _submit(q, [], cancel=[f"waitlist-offer:{entry_id}"])
+
+
+def on_waitlist_result(q: JobQueue, db: Session, entry: Optional[WaitlistEntry]) -> None:
+    """Nebenwirkungen nach waitlist.backfill()/release_offer() (nach dem Commit aufrufen)."""
+    if entry is None:
+        return
+    if entry.status == "BOOKED":
+        appt = db.query(Appointment).filter(Appointment.id == entry.appointment_id).first()
+        if appt:
+            on_booked(q, appt)
+    elif entry.status == "OFFERED":
+        _submit(q, [
+            JobSpec("send_waitlist_offer", {"entry_id": entry.id}),
+            JobSpec(
+                "expire_waitlist_offer",
+                {"entry_id": entry.id, "offer_start_ts_utc": entry.offer_start_ts_utc.isoformat()},
+                run_at=entry.offer_expires_at,
+                dedupe_key=f"waitlist-offer:{entry.id}",
+            ),
+        ])
@@ -0,0 +1,74 @@
+# mailer.py
+import os
+import logging
+import threading
+from email.message import EmailMessage
+
+log = logging.getLogger("praxisnow.mail")
+
+# MAIL_BACKEND: "console" (Default, nur Log), "memory" (Tests) oder "smtp"
+MAIL_BACKEND = os.getenv("MAIL_BACKEND", "console")
+MAIL_FROM = os.getenv("MAIL_FROM", "no-reply@praxisnow.local")
+SMTP_HOST = os.getenv("SMTP_HOST", "localhost")
+SMTP_PORT = int(os.getenv("SMTP_PORT", "587"))
+SMTP_USER = os.getenv("SMTP_USER")
+SMTP_PASSWORD = os.getenv("SMTP_PASSWORD")
+
+
+class ConsoleMailSink:
+    """Schreibt Mails nur ins Log – Default für lokale Entwicklung."""
+
+    def send(self, to: str, subject: str, body: str) -> None:
+        log.info("MAIL an %s: %s\n%s", to, subject, body)
+
+
+class MemoryMailSink:
+    """Sammelt Mails in einer Liste – Stub für Tests."""
+
+    def __init__(self):
+        self.outbox: list[dict] = []
+        self._lock = threading.Lock()
+
+    def send(self, to: str, subject: str, body: str) -> None:
+        with self._lock:
+            self.outbox.append({"to": to, "subject": subject, "body": body})
+
+
+class SmtpMailSink:
+    """Versand über SMTP (STARTTLS, wenn Zugangsdaten gesetzt sind)."""
+
+    def send(self, to: str, subject: str, body: str) -> None:
+        import smtplib  # erst beim ersten echten Versand laden
+
+        msg = EmailMessage()
+        msg["From"] = MAIL_FROM
+        msg["To"] = to
+        msg["Subject"] = subject
+        msg.set_content(body)
+        with smtplib.SMTP(SMTP_HOST, SMTP_PORT, timeout=10) as smtp:
+            if SMTP_USER:
+                smtp.starttls()
+                smtp.login(SMTP_USER, SMTP_PASSWORD or "")
+            smtp.send_message(msg)
+
+
+_SINKS = {
+    "console": ConsoleMailSink,
+    "memory": MemoryMailSink,
+    "smtp": SmtpMailSink,
+}
+
+def make_mail_sink(backend: str = MAIL_BACKEND):
+    """Neuer Mail-Sink für `backend` ("console", "memory" oder "smtp")."""
+    return _SINKS[backend]()
+
+
+_sink = None
+
+
+def get_mail_sink():
+    """Prozessweiter Default-Sink für Skripte; Apps aus create_app() haben ihren eigenen."""
+    global _sink
+    if _sink is None:
+        _sink = make_mail_sink()
+    return _sink
@@ -1,51 +1,76 @@
 # --- imports (oben) ---
-from sqlalchemy import Column, String, DateTime, ForeignKey
-from datetime import datetime, timedelta
-from database import Base, engine, get_db
-from fastapi import FastAPI, Depends, HTTPException, Query, Request, Response
-from models import Practice, Resource, Service, Appointment, User
-from schemas import (
-    PracticeOut, PracticeDetail, SlotOut,
-    AppointmentIn, AppointmentOut,
-    RegisterIn, LoginIn, UserOut                                              # neu
-)
-from auth import hash_pw, check_pw, make_jwt, parse_jwt
-from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy.orm import Session
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime, parsedate_to_datetime
 from typing import Optional
 from zoneinfo import ZoneInfo
+import hmac
 import uuid
 
+from fastapi import APIRouter, FastAPI, Depends, HTTPException, Query, Request, Response
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
+from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
 
-
-from schemas import PracticeOut, PracticeDetail, SlotOut, AppointmentIn, AppointmentOut
+import database
+from database import Base, ReadRouter, ReadYourWritesMiddleware, get_db, get_read_db
+from models import Practice, Resource, Service, Appointment, User, WaitlistEntry, migrate_schema
+from schemas import (
+    PracticeOut, PracticeDetail, SlotOut,
+    AppointmentIn, AppointmentOut, RescheduleIn,
+    WaitlistIn, WaitlistOut, WaitlistPriorityIn,
+    RegisterIn, LoginIn, UserOut
+)
+from auth import hash_pw, check_pw, make_jwt, parse_jwt
+from mailer import make_mail_sink
+from settings import Settings
 from slot_engine import generate_slots
+import jobs
+import waitlist
 
-# --- app erstellen (vor JEDEM app.* Aufruf) ---
-app = FastAPI(title="PraxisNow API")
+# Alle Endpunkte hängen am Router; die App selbst baut create_app() (ganz unten)
+router = APIRouter()
 
-# --- CORS zuerst anhängen ---
-from fastapi.middleware.cors import CORSMiddleware
 
-app.add_middleware(
-    CORSMiddleware,
-    # erlaubt jede HTTPS-Origin (nicht http), funktioniert mit allow_credentials=True
-    allow_origin_regex=r"^https://.*$",
-    allow_credentials=True,
-    allow_methods=["GET","POST","PATCH","OPTIONS"],
-    allow_headers=["*"],
-)
+def get_job_queue(request: Request) -> jobs.JobQueue:
+    return request.app.state.job_queue
 
 
-@app.get("/")
+@router.get("/")
 def root():
     return {"message": "PraxisNow API – siehe /health und /docs"}
 
 
-@app.get("/health")
+@router.get("/health")
 def health():
+    # Liveness: Prozess läuft, keine Abhängigkeiten prüfen
     return {"status": "ok"}
 
+
+@router.get("/ready")
+def ready(request: Request, response: Response):
+    """Readiness: Startup abgeschlossen, DB und Job-Queue erreichbar."""
+    checks = {"startup": bool(getattr(request.app.state, "started", False))}
+    try:
+        with request.app.state.engine.connect() as con:
+            con.execute(text("SELECT 1"))
+        checks["database"] = True
+    except Exception:
+        checks["database"] = False
+    try:
+        request.app.state.job_queue.counts()
+        checks["jobs"] = True
+    except Exception:
+        checks["jobs"] = False
+    ok = all(checks.values())
+    if not ok:
+        response.status_code = 503
+    # Replikas beeinflussen die Readiness nicht – Fallback ist der Primary
+    replicas = request.app.state.read_router.status()
+    return {"status": "ready" if ok else "unavailable", "checks": checks, "replicas": replicas}
+
 def current_user(req: Request, db: Session = Depends(get_db)) -> User:
     token = req.cookies.get("session")
     uid = parse_jwt(token) if token else None
@@ -57,7 +82,7 @@ def current_user(req: Request, db: Session = Depends(get_db)) -> User:
     return u
 
 # --- Authentifizierung: Registrieren, Login, Logout, Me ---
-@app.post("/auth/register", response_model=UserOut)
+@router.post("/auth/register", response_model=UserOut)
 def register(payload: RegisterIn, response: Response, db: Session = Depends(get_db)):
     # E-Mail darf nicht doppelt existieren
     existing = db.query(User).filter(User.email == payload.email).first()
@@ -89,7 +114,7 @@ def register(payload: RegisterIn, response: Response, db: Session = Depends(get_
 
     return UserOut.model_validate(u.__dict__)
 
-@app.post("/auth/login", response_model=UserOut)
+@router.post("/auth/login", response_model=UserOut)
 def login(payload: LoginIn, response: Response, db: Session = Depends(get_db)):
     u = db.query(User).filter(User.email == payload.email).first()
     if not u:
@@ -114,52 +139,50 @@ def login(payload: LoginIn, response: Response, db: Session = Depends(get_db)):
 
     return UserOut.model_validate(u.__dict__)
 
-@app.get("/auth/me", response_model=UserOut)
+@router.get("/auth/me", response_model=UserOut)
 def me(u: User = Depends(current_user)):
     return UserOut.model_validate(u.__dict__)
 
-@app.post("/auth/logout")
+@router.post("/auth/logout")
 def logout(resp: Response):
     resp.delete_cookie("session", path="/")
     return {"ok": True}
 
 
-from fastapi.routing import APIRoute
-
+@router.get("/_routes")
+def list_routes(request: Request):
+    return [r.path for r in request.app.router.routes]
 
-@app.get("/_routes")
-def list_routes():
-    return [r.path for r in app.router.routes]
 
-
-@app.get("/public/practices", response_model=list[PracticeOut])
-def list_practices(db: Session = Depends(get_db)):
+@router.get("/public/practices", response_model=list[PracticeOut])
+def list_practices(db: Session = Depends(get_read_db)):
     return db.query(Practice).all()
 
-@app.get("/public/practices/{practice_id}", response_model=PracticeDetail)
-def practice_detail(practice_id: str, db: Session = Depends(get_db)):
+@router.get("/public/practices/{practice_id}", response_model=PracticeDetail)
+def practice_detail(practice_id: str, db: Session = Depends(get_read_db)):
     p = db.query(Practice).filter(Practice.id == practice_id).first()
     if not p:
         raise HTTPException(404, "Practice not found")
     return p
 
-@app.get("/public/practices/{practice_id}/slots", response_model=list[SlotOut])
+@router.get("/public/practices/{practice_id}/slots", response_model=list[SlotOut])
 
 def practice_slots(
     practice_id: str,
     days: int = Query(14, ge=1, le=60),
     service_id: Optional[str] = None,
     resource_id: Optional[str] = None,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
 
     return generate_slots(db, practice_id=practice_id, days=days, service_id=service_id, resource_id=resource_id)
 
-@app.post("/public/appointments", response_model=AppointmentOut)
+@router.post("/public/appointments", response_model=AppointmentOut)
 def book_appointment(
     payload: AppointmentIn,
     db: Session = Depends(get_db),
-    u: User = Depends(current_user)  # <-- NEU: nur eingeloggte Nutzer
+    u: User = Depends(current_user),  # <-- NEU: nur eingeloggte Nutzer
+    queue: jobs.JobQueue = Depends(get_job_queue),
 ):
     # 1) Validierung: gehören alle IDs zur gleichen Praxis?
     p = db.query(Practice).filter(Practice.id == payload.practice_id).first()
@@ -213,9 +236,17 @@ def book_appointment(
         user_id=u.id,  # <-- NEU
     )
     db.add(appt)
-    db.commit()
+    try:
+        db.commit()
+    except IntegrityError:
+        # uq_appointments_booked_slot: parallele Buchung desselben Slots
+        db.rollback()
+        raise HTTPException(status_code=409, detail="Slot already booked")
     db.refresh(appt)
 
+    # Nebenwirkungen (Mails, Erinnerung) laufen im Hintergrund
+    jobs.on_booked(queue, appt)
+
     return AppointmentOut(
         id=appt.id,
         start_ts_utc=appt.start_ts_utc,
@@ -227,32 +258,43 @@ def book_appointment(
 # ---------------------------------------------
 # Praxis: Termin stornieren
 # ---------------------------------------------
-@app.patch("/practice/appointments/{appointment_id}/cancel", response_model=AppointmentOut)
-def cancel_appointment(appointment_id: str, db: Session = Depends(get_db)):
+@router.patch("/practice/appointments/{appointment_id}/cancel", response_model=AppointmentOut)
+def cancel_appointment(
+    appointment_id: str,
+    db: Session = Depends(get_db),
+    queue: jobs.JobQueue = Depends(get_job_queue),
+):
     appt = db.query(Appointment).filter(Appointment.id == appointment_id).first()
     if not appt:
         raise HTTPException(404, "Appointment not found")
     if appt.status == "CANCELLED":
         return AppointmentOut(id=appt.id, start_ts_utc=appt.start_ts_utc, end_ts_utc=appt.end_ts_utc, status=appt.status)
     appt.status = "CANCELLED"
+    # frei gewordenen Slot an die Warteliste geben (eigener Savepoint, Fehler dort
+    # verhindern das Storno nicht)
+    backfilled = waitlist.backfill_isolated(
+        db, appt.practice_id, appt.service_id, appt.resource_id, appt.start_ts_utc, appt.end_ts_utc
+    )
     try:
         db.commit()
     except Exception:
         db.rollback()
         raise HTTPException(409, "Cancel conflict")
     db.refresh(appt)
+    jobs.on_cancelled(queue, appt)
+    jobs.on_waitlist_result(queue, db, backfilled)
     return AppointmentOut(id=appt.id, start_ts_utc=appt.start_ts_utc, end_ts_utc=appt.end_ts_utc, status=appt.status)
 
 # ---------------------------------------------
 # Praxis: Termin verschieben
 # ---------------------------------------------
-from pydantic import BaseModel
-
-class RescheduleIn(BaseModel):
-    new_start_ts_iso_local: str
-
-@app.patch("/practice/appointments/{appointment_id}/reschedule", response_model=AppointmentOut)
-def reschedule_appointment(appointment_id: str, payload: RescheduleIn, db: Session = Depends(get_db)):
+@router.patch("/practice/appointments/{appointment_id}/reschedule", response_model=AppointmentOut)
+def reschedule_appointment(
+    appointment_id: str,
+    payload: RescheduleIn,
+    db: Session = Depends(get_db),
+    queue: jobs.JobQueue = Depends(get_job_queue),
+):
     appt = db.query(Appointment).filter(Appointment.id == appointment_id).first()
     if not appt:
         raise HTTPException(404, "Appointment not found")
@@ -282,81 +324,299 @@ def reschedule_appointment(appointment_id: str, payload: RescheduleIn, db: Sessi
     if clash:
         raise HTTPException(409, "New slot already booked")
 
+    old_start_utc, old_end_utc = appt.start_ts_utc, appt.end_ts_utc
     appt.start_ts_utc = new_start_utc
     appt.end_ts_utc = new_end_utc
+    # frei gewordenen Slot an die Warteliste geben (eigener Savepoint, Fehler dort
+    # verhindern das Verschieben nicht)
+    backfilled = waitlist.backfill_isolated(
+        db, appt.practice_id, appt.service_id, appt.resource_id, old_start_utc, old_end_utc
+    )
     try:
         db.commit()
     except Exception:
         db.rollback()
         raise HTTPException(409, "Reschedule conflict")
     db.refresh(appt)
+    jobs.on_rescheduled(queue, appt)
+    jobs.on_waitlist_result(queue, db, backfilled)
     return AppointmentOut(id=appt.id, start_ts_utc=appt.start_ts_utc, end_ts_utc=appt.end_ts_utc, status=appt.status)
 
 
+# ---------------------------------------------
+# Praxis: Termine auflisten
+# ---------------------------------------------
+@router.get("/practice/appointments", response_model=list[AppointmentOut])
+def list_appointments(practice_id: str, db: Session = Depends(get_read_db)):
+    items = db.query(Appointment).filter(
+        Appointment.practice_id == practice_id,
+        Appointment.status == "BOOKED"
+    ).order_by(Appointment.start_ts_utc.asc()).all()
+    return [
+        AppointmentOut(
+            id=i.id,
+            start_ts_utc=i.start_ts_utc,
+            end_ts_utc=i.end_ts_utc,
+            status=i.status
+        ) for i in items
+    ]
 
-    tz = ZoneInfo(p.time_zone or "Europe/Berlin")
-    try:
-        start_local = datetime.strptime(payload.start_ts_iso_local, "%Y-%m-%d %H:%M").replace(tzinfo=tz)
-    except ValueError:
-        raise HTTPException(400, "Invalid start_ts_iso_local. Use 'YYYY-MM-DD HH:MM'")
 
-    end_local = start_local + timedelta(minutes=s.duration_min)
-    start_utc = start_local.astimezone(ZoneInfo("UTC")).replace(tzinfo=None)
-    end_utc = end_local.astimezone(ZoneInfo("UTC")).replace(tzinfo=None)
 
-    exists = db.query(Appointment).filter(
-        Appointment.resource_id == payload.resource_id,
-        Appointment.start_ts_utc == start_utc,
-        Appointment.end_ts_utc == end_utc,
-        Appointment.status == "BOOKED"
-    ).first()
-    if exists:
-        raise HTTPException(409, "Slot already booked")
+# ---------------------------------------------
+# Warteliste (Patient)
+# ---------------------------------------------
+def _own_entry(db: Session, entry_id: str, u: User) -> WaitlistEntry:
+    entry = db.query(WaitlistEntry).filter(WaitlistEntry.id == entry_id).first()
+    if not entry or entry.user_id != u.id:
+        raise HTTPException(404, "Waitlist entry not found")
+    return entry
 
-    appt = Appointment(
+
+@router.post("/public/waitlist", response_model=WaitlistOut)
+def join_waitlist(payload: WaitlistIn, db: Session = Depends(get_db), u: User = Depends(current_user)):
+    s = db.query(Service).filter(
+        Service.id == payload.service_id,
+        Service.practice_id == payload.practice_id
+    ).first()
+    if not s:
+        raise HTTPException(400, "Invalid practice/service")
+    if payload.resource_id:
+        r = db.query(Resource).filter(
+            Resource.id == payload.resource_id,
+            Resource.practice_id == payload.practice_id
+        ).first()
+        if not r:
+            raise HTTPException(400, "Invalid resource")
+    if payload.date_to < payload.date_from:
+        raise HTTPException(400, "date_to must not be before date_from")
+    if (payload.date_to - payload.date_from).days + 1 > waitlist.WAITLIST_MAX_DAYS:
+        raise HTTPException(400, f"Date range too long (max {waitlist.WAITLIST_MAX_DAYS} days)")
+
+    entry = WaitlistEntry(
         id=str(uuid.uuid4()),
         practice_id=payload.practice_id,
-        resource_id=payload.resource_id,
         service_id=payload.service_id,
-        patient_email=payload.patient_email,
-        patient_name=payload.patient_name,
-        start_ts_utc=start_utc,
-        end_ts_utc=end_utc,
-        status="BOOKED",
-        source="PATIENT"
+        resource_id=payload.resource_id,
+        user_id=u.id,
+        patient_email=payload.patient_email or u.email,
+        patient_name=payload.patient_name or u.name,
+        date_from=payload.date_from,
+        date_to=payload.date_to,
+        priority=100,
+        auto_book=payload.auto_book,
+        status="OPEN",
     )
-    db.add(appt)
-    try:
-        db.commit()
-    except Exception:
+    waitlist.add_entry(db, entry)
+    db.commit()
+    db.refresh(entry)
+    return entry
+
+
+@router.get("/public/waitlist", response_model=list[WaitlistOut])
+def my_waitlist(db: Session = Depends(get_db), u: User = Depends(current_user)):
+    return db.query(WaitlistEntry).filter(
+        WaitlistEntry.user_id == u.id
+    ).order_by(WaitlistEntry.created_at.desc()).all()
+
+
+@router.patch("/public/waitlist/{entry_id}/cancel", response_model=WaitlistOut)
+def leave_waitlist(
+    entry_id: str,
+    db: Session = Depends(get_db),
+    u: User = Depends(current_user),
+    queue: jobs.JobQueue = Depends(get_job_queue),
+):
+    entry = _own_entry(db, entry_id, u)
+    if entry.status not in ("OPEN", "OFFERED"):
+        raise HTTPException(409, "Waitlist entry is no longer open")
+    # ein offenes Angebot zuerst an den Nächsten weitergeben
+    nxt = waitlist.release_offer(db, entry, reopen=False)
+    waitlist.cancel_entry(db, entry)
+    db.commit()
+    db.refresh(entry)
+    jobs.on_waitlist_result(queue, db, nxt)
+    return entry
+
+
+@router.patch("/public/waitlist/{entry_id}/accept", response_model=AppointmentOut)
+def accept_waitlist_offer(
+    entry_id: str,
+    db: Session = Depends(get_db),
+    u: User = Depends(current_user),
+    queue: jobs.JobQueue = Depends(get_job_queue),
+):
+    entry = _own_entry(db, entry_id, u)
+    if entry.status != "OFFERED":
+        raise HTTPException(409, "No open offer")
+    if entry.offer_expires_at <= datetime.utcnow():
+        raise HTTPException(409, "Offer expired")
+    if not waitlist.slot_is_free(db, entry.offer_resource_id, entry.offer_start_ts_utc, entry.offer_end_ts_utc):
+        raise HTTPException(409, "Slot already booked")
+
+    appt = waitlist.book_entry(db, entry, entry.offer_resource_id, entry.offer_start_ts_utc, entry.offer_end_ts_utc)
+    if not appt:
         db.rollback()
         raise HTTPException(409, "Booking conflict")
+    db.commit()
     db.refresh(appt)
+    jobs.cancel_waitlist_offer(queue, entry.id)
+    jobs.on_booked(queue, appt)
     return AppointmentOut(id=appt.id, start_ts_utc=appt.start_ts_utc, end_ts_utc=appt.end_ts_utc, status=appt.status)
 
 
-# Deine bestehenden Models (Practice, Resource, Service) bleiben unverändert …
+@router.patch("/public/waitlist/{entry_id}/decline", response_model=WaitlistOut)
+def decline_waitlist_offer(
+    entry_id: str,
+    db: Session = Depends(get_db),
+    u: User = Depends(current_user),
+    queue: jobs.JobQueue = Depends(get_job_queue),
+):
+    entry = _own_entry(db, entry_id, u)
+    if entry.status != "OFFERED":
+        raise HTTPException(409, "No open offer")
+    nxt = waitlist.release_offer(db, entry)
+    db.commit()
+    db.refresh(entry)
+    jobs.cancel_waitlist_offer(queue, entry.id)
+    jobs.on_waitlist_result(queue, db, nxt)
+    return entry
 
 
+# ---------------------------------------------
+# Praxis: Warteliste
+# ---------------------------------------------
+@router.get("/practice/waitlist", response_model=list[WaitlistOut])
+def list_waitlist(practice_id: str, db: Session = Depends(get_read_db)):
+    return db.query(WaitlistEntry).filter(
+        WaitlistEntry.practice_id == practice_id,
+        WaitlistEntry.status.in_(["OPEN", "OFFERED"])
+    ).order_by(WaitlistEntry.priority.asc(), WaitlistEntry.created_at.asc()).all()
+
+
+@router.patch("/practice/waitlist/{entry_id}/priority", response_model=WaitlistOut)
+def set_waitlist_priority(entry_id: str, payload: WaitlistPriorityIn, db: Session = Depends(get_db)):
+    entry = db.query(WaitlistEntry).filter(WaitlistEntry.id == entry_id).first()
+    if not entry:
+        raise HTTPException(404, "Waitlist entry not found")
+    waitlist.set_priority(db, entry, payload.priority)
+    db.commit()
+    db.refresh(entry)
+    return entry
 
-    # ── NEU: Zuordnung zum registrierten User ──
-    user_id = Column(String, ForeignKey("users.id"), nullable=True)
 
 # ---------------------------------------------
-# Praxis: Termine auflisten
+# Praxis: Kalender-Feed (iCalendar)
 # ---------------------------------------------
-@app.get("/practice/appointments", response_model=list[AppointmentOut])
-def list_appointments(practice_id: str, db: Session = Depends(get_db)):
-    items = db.query(Appointment).filter(
-        Appointment.practice_id == practice_id,
-        Appointment.status == "BOOKED"
-    ).order_by(Appointment.start_ts_utc.asc()).all()
-    return [
-        AppointmentOut(
-            id=i.id,
-            start_ts_utc=i.start_ts_utc,
-            end_ts_utc=i.end_ts_utc,
-            status=i.status
-        ) for i in items
-    ]
+@router.get("/practice/{practice_id}/calendar.ics")
+def practice_calendar(
+    practice_id: str,
+    request: Request,
+    token: str = "",
+    resource_id: Optional[str] = None,
+    since: Optional[datetime] = None,
+    db: Session = Depends(get_read_db),
+):
+    from ical import feed_version, stream_ics  # nur für Kalender-Clients laden
+
+    # Der Feed enthält Patientennamen: nur mit dem geheimen Abo-Token der Praxis
+    row = db.query(Practice.calendar_token).filter(Practice.id == practice_id).first()
+    if not row or not row[0] or not hmac.compare_digest(row[0], token):
+        raise HTTPException(404, "Practice not found")
+    if since is not None and since.tzinfo is not None:
+        since = since.astimezone(ZoneInfo("UTC")).replace(tzinfo=None)
+
+    # Conditional GET: Kalender-Clients pollen alle paar Minuten
+    etag, last_modified = feed_version(db, practice_id, resource_id, since)
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if last_modified:
+        headers["Last-Modified"] = format_datetime(last_modified.replace(tzinfo=timezone.utc), usegmt=True)
+
+    inm = request.headers.get("if-none-match")
+    ims = request.headers.get("if-modified-since")
+    if inm is not None:
+        if etag in [t.strip() for t in inm.split(",")] or inm.strip() == "*":
+            return Response(status_code=304, headers=headers)
+    elif ims and last_modified:
+        try:
+            if last_modified.replace(microsecond=0) <= parsedate_to_datetime(ims).replace(tzinfo=None):
+                return Response(status_code=304, headers=headers)
+        except (TypeError, ValueError):
+            pass
+
+    return StreamingResponse(
+        stream_ics(request.state.read_factory, practice_id, resource_id, since),
+        media_type="text/calendar; charset=utf-8",
+        headers=headers,
+    )
+
+
+# ---------------------------------------------
+# App-Factory
+# ---------------------------------------------
+def create_app(settings: Optional[Settings] = None) -> FastAPI:
+    """Baut eine eigenständige App-Instanz (eigene Engine, Job-Queue, Worker, Mail-Sink).
+
+    Schwere Arbeit (Schema anlegen, Worker starten) passiert erst im Lifespan,
+    damit das Bauen der App – z.B. in Tests – billig bleibt.
+    """
+    settings = settings or Settings.from_env()
+
+    if settings.database_url == database.DATABASE_URL:
+        engine = database.engine
+    else:
+        engine = database.make_engine(settings.database_url)
+    session_factory = database.make_sessionmaker(engine)
+    read_router = ReadRouter(engine, settings.replica_urls)
+    job_queue = jobs.JobQueue(settings.jobs_db_path)
+    mail_sink = make_mail_sink(settings.mail_backend)
+    job_runner = jobs.JobRunner(job_queue, session_factory, mail_sink=mail_sink)
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        if settings.create_schema:
+            Base.metadata.create_all(bind=engine)
+            migrate_schema(engine)
+        if settings.jobs_enabled:
+            job_runner.start()
+        app.state.started = True
+        try:
+            yield
+        finally:
+            app.state.started = False
+            job_runner.stop()
+
+    app = FastAPI(title="PraxisNow API", lifespan=lifespan)
+    app.state.settings = settings
+    app.state.engine = engine
+    app.state.SessionLocal = session_factory
+    app.state.read_router = read_router
+    app.state.job_queue = job_queue
+    app.state.job_runner = job_runner
+    app.state.mail_sink = mail_sink
+
+    if settings.replica_urls:
+        app.add_middleware(ReadYourWritesMiddleware, sticky_seconds=settings.sticky_seconds)
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origin_regex=settings.cors_origin_regex,
+        allow_credentials=True,
+        allow_methods=["GET","POST","PATCH","OPTIONS"],
+        allow_headers=["*"],
+    )
+    app.include_router(router)
+    return app
+
+
+_default_app: Optional[FastAPI] = None
+
 
+def __getattr__(name: str):
+    # `uvicorn main:app` bleibt möglich; die Default-App wird erst beim Zugriff gebaut
+    # (alternativ: `uvicorn main:create_app --factory`)
+    global _default_app
+    if name == "app":
+        if _default_app is None:
+            _default_app = create_app()
+        return _default_app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
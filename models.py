@@ -1,5 +1,6 @@
+import re
 from datetime import datetime
-from sqlalchemy import Column, String, DateTime, Integer, ForeignKey
+from sqlalchemy import Boolean, Column, Date, String, DateTime, Integer, ForeignKey, Index, inspect, text
 from sqlalchemy.orm import relationship
 from database import Base
 
@@ -10,6 +11,9 @@ class Practice(Base):
     id = Column(String, primary_key=True)
     name = Column(String, nullable=False)
     city = Column(String, nullable=False)
+    email = Column(String, nullable=True)
+    # geheimer Token für die Kalender-Abo-URL (siehe calendar_token.py)
+    calendar_token = Column(String, nullable=True)
     time_zone = Column(String, nullable=False)
 
     # Beziehungen
@@ -70,8 +74,144 @@ class Appointment(Base):
     end_ts_utc = Column(DateTime, nullable=False)
     status = Column(String, nullable=False, default="BOOKED")
     source = Column(String, nullable=True)
+    user_id = Column(String, ForeignKey("users.id"), nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    # Änderungsspalte für inkrementellen Kalender-Sync (since=) und ETag/Last-Modified
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     # WICHTIG: saubere Relationships in beide Richtungen
     practice = relationship("Practice", back_populates="appointments")
     resource = relationship("Resource", back_populates="appointments")
     service = relationship("Service", back_populates="appointments")
+
+    __table_args__ = (
+        Index("ix_appointments_practice_updated", "practice_id", "updated_at"),
+        # Doppelbuchungsschutz nur für aktive Termine – stornierte Zeilen blockieren
+        # den Slot nicht (Warteliste, erneute Buchung)
+        Index(
+            "uq_appointments_booked_slot",
+            "resource_id", "start_ts_utc", "end_ts_utc",
+            unique=True,
+            sqlite_where=text("status = 'BOOKED'"),
+            postgresql_where=text("status = 'BOOKED'"),
+        ),
+    )
+
+
+class WaitlistEntry(Base):
+    __tablename__ = "waitlist_entries"
+
+    id = Column(String, primary_key=True)
+    practice_id = Column(String, ForeignKey("practices.id"), nullable=False, index=True)
+    service_id = Column(String, ForeignKey("services.id"), nullable=False)
+    resource_id = Column(String, ForeignKey("resources.id"), nullable=True)  # None = egal welche/r
+    user_id = Column(String, ForeignKey("users.id"), nullable=True, index=True)
+
+    patient_email = Column(String, nullable=False)
+    patient_name = Column(String, nullable=False)
+    # gewünschter Zeitraum in Praxis-Ortszeit (inklusive)
+    date_from = Column(Date, nullable=False)
+    date_to = Column(Date, nullable=False)
+    priority = Column(Integer, nullable=False, default=100)  # kleiner = zuerst
+    auto_book = Column(Boolean, nullable=False, default=False)
+    status = Column(String, nullable=False, default="OPEN")  # OPEN, OFFERED, BOOKED, CANCELLED
+
+    # Angebot bzw. Buchung aus dem Nachrücken
+    offer_resource_id = Column(String, nullable=True)
+    offer_start_ts_utc = Column(DateTime, nullable=True)
+    offer_end_ts_utc = Column(DateTime, nullable=True)
+    offer_expires_at = Column(DateTime, nullable=True)
+    appointment_id = Column(String, ForeignKey("appointments.id"), nullable=True)
+
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+class WaitlistDay(Base):
+    """Intervall-Index der Warteliste: eine Zeile pro (offenem Eintrag, Tag).
+
+    Die Suche nach Nachrückern ist damit ein Index-Seek auf
+    (practice_id, service_id, day) in Prioritätsreihenfolge statt eines
+    Scans über alle offenen Einträge. Nur Einträge mit Status OPEN sind indiziert.
+    """
+    __tablename__ = "waitlist_days"
+
+    entry_id = Column(String, ForeignKey("waitlist_entries.id"), primary_key=True)
+    day = Column(Date, primary_key=True)
+    practice_id = Column(String, nullable=False)
+    service_id = Column(String, nullable=False)
+    resource_id = Column(String, nullable=True)
+    priority = Column(Integer, nullable=False)
+    created_at = Column(DateTime, nullable=False)
+
+    __table_args__ = (
+        Index(
+            "ix_waitlist_days_lookup",
+            "practice_id", "service_id", "day", "priority", "created_at",
+        ),
+    )
+
+
+def migrate_schema(engine) -> None:
+    """Ergänzt Spalten/Indizes, die create_all bei bestehenden Tabellen nicht anlegt."""
+    insp = inspect(engine)
+    if insp.has_table("practices"):
+        if "calendar_token" not in {c["name"] for c in insp.get_columns("practices")}:
+            with engine.begin() as con:
+                con.execute(text("ALTER TABLE practices ADD COLUMN calendar_token TEXT"))
+    if not insp.has_table("appointments"):
+        return
+    cols = {c["name"] for c in insp.get_columns("appointments")}
+    with engine.begin() as con:
+        if "created_at" not in cols:
+            con.execute(text("ALTER TABLE appointments ADD COLUMN created_at TIMESTAMP"))
+        if "updated_at" not in cols:
+            con.execute(text("ALTER TABLE appointments ADD COLUMN updated_at TIMESTAMP"))
+            con.execute(text(
+                "UPDATE appointments SET updated_at = COALESCE(created_at, CURRENT_TIMESTAMP)"
+            ))
+    _drop_legacy_double_booking_constraint(engine)
+    for idx in Appointment.__table__.indexes:
+        idx.create(bind=engine, checkfirst=True)
+
+
+def _drop_legacy_double_booking_constraint(engine) -> None:
+    """Entfernt UNIQUE (resource_id, start_ts_utc, end_ts_utc) aus älteren Schemas.
+
+    Der Constraint zählt auch stornierte Zeilen, damit ließe sich ein
+    stornierter Slot nie neu vergeben. Ersetzt wird er durch den partiellen
+    Index uq_appointments_booked_slot (nur Status BOOKED).
+    """
+    name = "uq_no_double_booking"
+    if engine.dialect.name != "sqlite":
+        names = {c["name"] for c in inspect(engine).get_unique_constraints("appointments")}
+        if name in names:
+            with engine.begin() as con:
+                con.execute(text(f"ALTER TABLE appointments DROP CONSTRAINT {name}"))
+        return
+
+    # SQLite kann keine Constraints droppen -> Tabelle ohne ihn neu aufbauen.
+    # pysqlite committet DDL außerhalb einer expliziten Transaktion sofort; daher
+    # alles in BEGIN IMMEDIATE (atomar, und parallel startende Worker warten).
+    select_ddl = "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'appointments'"
+    with engine.connect() as con:
+        ddl = con.exec_driver_sql(select_ddl).scalar()
+        if not ddl or name not in ddl:
+            return
+        con.exec_driver_sql("BEGIN IMMEDIATE")
+        try:
+            ddl = con.exec_driver_sql(select_ddl).scalar()
+            if name in ddl:
+                new_ddl = re.sub(
+                    rf",\s*CONSTRAINT\s+{name}\s+UNIQUE\s*\([^)]*\)", "", ddl, flags=re.IGNORECASE
+                )
+                new_ddl = re.sub(r'CREATE TABLE\s+"?appointments"?', "CREATE TABLE appointments__new", new_ddl, count=1)
+                # Rest eines abgebrochenen Laufs älterer Versionen
+                con.exec_driver_sql("DROP TABLE IF EXISTS appointments__new")
+                con.exec_driver_sql(new_ddl)
+                con.exec_driver_sql("INSERT INTO appointments__new SELECT * FROM appointments")
+                con.exec_driver_sql("DROP TABLE appointments")
+                con.exec_driver_sql("ALTER TABLE appointments__new RENAME TO appointments")
+            con.exec_driver_sql("COMMIT")
+        except Exception:
+            con.exec_driver_sql("ROLLBACK")
+            raise
@@ -1,6 +1,6 @@
 from pydantic import BaseModel, EmailStr, Field
 from typing import Optional, List
-from datetime import datetime
+from datetime import date, datetime
 
 # ── NEU: Auth ─────────────────────────────────────────────
 class RegisterIn(BaseModel):
@@ -81,6 +81,39 @@ class AppointmentOut(BaseModel):
     end_ts_utc: datetime
     status: str
 
+class RescheduleIn(BaseModel):
+    new_start_ts_iso_local: str
+
+class WaitlistIn(BaseModel):
+    practice_id: str
+    service_id: str
+    resource_id: Optional[str] = None
+    date_from: date
+    date_to: date
+    auto_book: bool = False              # True: freien Slot direkt buchen statt anbieten
+    patient_email: Optional[EmailStr] = None
+    patient_name: Optional[str] = None
+
+class WaitlistPriorityIn(BaseModel):
+    priority: int
+
+class WaitlistOut(BaseModel):
+    id: str
+    practice_id: str
+    service_id: str
+    resource_id: Optional[str] = None
+    date_from: date
+    date_to: date
+    priority: int
+    auto_book: bool
+    status: str
+    offer_start_ts_utc: Optional[datetime] = None
+    offer_end_ts_utc: Optional[datetime] = None
+    offer_expires_at: Optional[datetime] = None
+    appointment_id: Optional[str] = None
+    class Config:
+        from_attributes = True
+
 # ── NEU: Auth ─────────────────────────────────────────────
 class RegisterIn(BaseModel):
     email: EmailStr
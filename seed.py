@@ -1,9 +1,10 @@
 import uuid
 from sqlalchemy.orm import Session
 from database import Base, engine, SessionLocal
-from models import Practice, Resource, Service, RecurringAvailability
+from models import Practice, Resource, Service, RecurringAvailability, migrate_schema
 
 Base.metadata.create_all(bind=engine)
+migrate_schema(engine)
 
 def seed():
     db: Session = SessionLocal()
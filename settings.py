@@ -0,0 +1,40 @@
+# settings.py
+import os
+from dataclasses import dataclass
+from typing import Tuple
+
+
+def _flag(name: str, default: str) -> bool:
+    return os.getenv(name, default).lower() in ("1", "true", "yes")
+
+
+@dataclass(frozen=True)
+class Settings:
+    """Konfiguration für eine App-Instanz (siehe main.create_app)."""
+
+    database_url: str = "sqlite:///./app.db"
+    jobs_db_path: str = "./jobs.db"
+    jobs_enabled: bool = True
+    # "console", "memory" (Tests: app.state.mail_sink.outbox) oder "smtp"
+    mail_backend: str = "console"
+    # Tabellen beim Start anlegen/migrieren (statt nur über seed.py)
+    create_schema: bool = True
+    # erlaubt jede HTTPS-Origin (nicht http), funktioniert mit allow_credentials=True
+    cors_origin_regex: str = r"^https://.*$"
+    # Read-Replikas für reine Lese-Endpunkte (leer = alles über den Primary)
+    replica_urls: Tuple[str, ...] = ()
+    # so lange nach einem Schreibzugriff vom Primary lesen (read-your-writes)
+    sticky_seconds: int = 10
+
+    @classmethod
+    def from_env(cls) -> "Settings":
+        return cls(
+            database_url=os.getenv("DATABASE_URL", cls.database_url),
+            jobs_db_path=os.getenv("JOBS_DB_PATH", cls.jobs_db_path),
+            jobs_enabled=_flag("JOBS_ENABLED", "1"),
+            mail_backend=os.getenv("MAIL_BACKEND", cls.mail_backend),
+            create_schema=_flag("CREATE_SCHEMA", "1"),
+            cors_origin_regex=os.getenv("CORS_ORIGIN_REGEX", cls.cors_origin_regex),
+            replica_urls=tuple(u.strip() for u in os.getenv("REPLICA_URLS", "").split(",") if u.strip()),
+            sticky_seconds=int(os.getenv("STICKY_SECONDS", str(cls.sticky_seconds))),
+        )
@@ -0,0 +1,87 @@
+import os
+import shutil
+import sys
+
+import pytest
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main  # noqa: E402
+from models import Practice, Resource, Service  # noqa: E402
+from settings import Settings  # noqa: E402
+
+
+@pytest.fixture
+def make_app(tmp_path):
+    """Baut isolierte App-Instanzen mit eigenen SQLite-Dateien und Memory-Mail-Sink."""
+    def factory(name: str = "app", **overrides):
+        settings = Settings(
+            database_url=f"sqlite:///{tmp_path / name}.db",
+            jobs_db_path=str(tmp_path / f"{name}-jobs.db"),
+            jobs_enabled=False,
+            mail_backend="memory",
+            **overrides,
+        )
+        return main.create_app(settings)
+    return factory
+
+
+@pytest.fixture
+def app(make_app):
+    return make_app()
+
+
+@pytest.fixture
+def client(app):
+    # https, damit die Secure-Cookies (session) mitgeschickt werden
+    with TestClient(app, base_url="https://testserver") as c:
+        seed(app)
+        yield c
+
+
+def seed(app) -> None:
+    db = app.state.SessionLocal()
+    try:
+        db.add(Practice(id="p", name="Praxis", city="Berlin", time_zone="Europe/Berlin", email="praxis@praxis.de"))
+        db.add(Resource(id="r", practice_id="p", name="Therapeut/in A"))
+        db.add(Service(id="s", practice_id="p", name="Erstgespräch", duration_min=50))
+        db.commit()
+    finally:
+        db.close()
+
+
+def login(app, email: str) -> TestClient:
+    """Neuer Client mit eigenem Session-Cookie (ohne Lifespan – der läuft schon)."""
+    c = TestClient(app, base_url="https://testserver")
+    r = c.post("/auth/register", json={"email": email, "password": "12345678", "name": email.split("@")[0]})
+    assert r.status_code == 200, r.text
+    return c
+
+
+def book(c: TestClient, start: str = "2030-01-07 10:00", **extra):
+    payload = {
+        "practice_id": "p",
+        "resource_id": "r",
+        "service_id": "s",
+        "start_ts_iso_local": start,
+        "patient_email": "patient@praxis.de",
+        "patient_name": "Pat",
+        **extra,
+    }
+    r = c.post("/public/appointments", json=payload)
+    assert r.status_code == 200, r.text
+    return r.json()
+
+
+@pytest.fixture
+def legacy_app(tmp_path):
+    """App auf einer Kopie des ausgelieferten app.db (altes Schema mit uq_no_double_booking)."""
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    shutil.copy(os.path.join(root, "app.db"), tmp_path / "legacy.db")
+    return main.create_app(Settings(
+        database_url=f"sqlite:///{tmp_path / 'legacy.db'}",
+        jobs_db_path=str(tmp_path / "legacy-jobs.db"),
+        jobs_enabled=False,
+        mail_backend="memory",
+    ))
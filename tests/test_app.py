@@ -0,0 +1,57 @@
+import os
+import subprocess
+import sys
+
+from fastapi.testclient import TestClient
+
+from conftest import book, login, seed
+from models import Practice
+
+
+def test_create_app_is_cheap(tmp_path, make_app):
+    make_app()
+    # weder DB- noch Job-Datei vor dem Lifespan
+    assert os.listdir(tmp_path) == []
+
+
+def test_apps_are_isolated(make_app):
+    a, b = make_app("a"), make_app("b")
+    with TestClient(a, base_url="https://testserver") as ca, TestClient(b, base_url="https://testserver"):
+        seed(a)
+        assert len(ca.get("/public/practices").json()) == 1
+        db = b.state.SessionLocal()
+        assert db.query(Practice).count() == 0
+        db.close()
+
+        book(login(a, "anna@praxis.de"))
+        a.state.job_runner.run_pending()
+        assert a.state.mail_sink.outbox
+        assert b.state.mail_sink.outbox == []
+        assert b.state.job_queue.counts() == {}
+
+
+def test_health_and_ready(app):
+    c = TestClient(app, base_url="https://testserver")
+    # ohne Lifespan: Prozess lebt, ist aber nicht bereit
+    assert c.get("/health").json() == {"status": "ok"}
+    assert c.get("/ready").status_code == 503
+    with TestClient(app, base_url="https://testserver") as c:
+        r = c.get("/ready")
+        assert r.status_code == 200
+        assert r.json()["checks"] == {"startup": True, "database": True, "jobs": True}
+
+
+def test_auth_deps_are_lazy():
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    out = subprocess.run(
+        [sys.executable, "-c", "import sys, main; print('bcrypt' in sys.modules, 'jwt' in sys.modules)"],
+        cwd=root, capture_output=True, text=True, check=True,
+    ).stdout
+    assert out.strip() == "False False"
+
+
+def test_import_time_budget(capsys):
+    import check_importtime
+
+    # Budget (IMPORT_BUDGET_MS) und lazy geladene Module, siehe check_importtime.py
+    assert check_importtime.main(["--top", "5"]) == 0, capsys.readouterr().out
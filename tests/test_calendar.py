@@ -0,0 +1,78 @@
+from datetime import datetime, timedelta
+from email.utils import parsedate_to_datetime
+
+from calendar_token import ensure_calendar_token
+from conftest import book, login
+from models import Appointment, Practice
+
+
+def _token(app) -> str:
+    db = app.state.SessionLocal()
+    try:
+        return ensure_calendar_token(db, db.get(Practice, "p"))
+    finally:
+        db.close()
+
+
+def test_feed_requires_token(app, client):
+    book(login(app, "anna@praxis.de"))
+    assert client.get("/practice/p/calendar.ics").status_code == 404  # noch kein Token
+    token = _token(app)
+    assert client.get("/practice/p/calendar.ics", params={"token": "falsch"}).status_code == 404
+
+    r = client.get("/practice/p/calendar.ics", params={"token": token})
+    assert r.status_code == 200
+    assert "SUMMARY:Erstgespräch – Pat" in r.text
+
+
+def test_feed_conditional_get(app, client):
+    book(login(app, "anna@praxis.de"))
+    params = {"token": _token(app)}
+    r = client.get("/practice/p/calendar.ics", params=params)
+    assert client.get("/practice/p/calendar.ics", params=params, headers={"If-None-Match": r.headers["etag"]}).status_code == 304
+    assert client.get("/practice/p/calendar.ics", params=params, headers={"If-Modified-Since": r.headers["last-modified"]}).status_code == 304
+
+
+def _backdate(app, **ages):
+    db = app.state.SessionLocal()
+    try:
+        for appt_id, hours in ages.items():
+            db.get(Appointment, appt_id).updated_at = datetime.utcnow() - timedelta(hours=hours)
+        db.commit()
+    finally:
+        db.close()
+
+
+def test_cancel_changes_feed_version(app, client):
+    a = book(login(app, "anna@praxis.de"))
+    b = book(login(app, "bert@praxis.de"), start="2030-01-08 10:00")
+    _backdate(app, **{a["id"]: 2, b["id"]: 1})
+    params = {"token": _token(app)}
+    before = client.get("/practice/p/calendar.ics", params=params)
+
+    # zuletzt geänderter Termin wird storniert: Version muss steigen, nicht fallen
+    client.patch(f"/practice/appointments/{b['id']}/cancel")
+    r = client.get("/practice/p/calendar.ics", params=params, headers={"If-Modified-Since": before.headers["last-modified"]})
+    assert r.status_code == 200
+    assert r.headers["etag"] != before.headers["etag"]
+    assert parsedate_to_datetime(r.headers["last-modified"]) > parsedate_to_datetime(before.headers["last-modified"])
+    assert f"UID:{b['id']}@praxisnow" not in r.text
+    r = client.get("/practice/p/calendar.ics", params=params, headers={"If-None-Match": before.headers["etag"]})
+    assert r.status_code == 200
+
+
+def test_feed_since_returns_changes_only(app, client):
+    a = book(login(app, "anna@praxis.de"))
+    b = book(login(app, "bert@praxis.de"), start="2030-01-08 10:00")
+    _backdate(app, **{a["id"]: 2, b["id"]: 2})
+    since = (datetime.utcnow() - timedelta(hours=1)).strftime("%Y-%m-%dT%H:%M:%S")
+    params = {"token": _token(app), "since": since}
+
+    r = client.get("/practice/p/calendar.ics", params=params)
+    assert "BEGIN:VEVENT" not in r.text
+
+    client.patch(f"/practice/appointments/{b['id']}/cancel")
+    r = client.get("/practice/p/calendar.ics", params=params)
+    assert f"UID:{b['id']}@praxisnow" in r.text
+    assert "STATUS:CANCELLED" in r.text
+    assert f"UID:{a['id']}@praxisnow" not in r.text
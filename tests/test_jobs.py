@@ -0,0 +1,145 @@
+import json
+import sqlite3
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+import jobs
+from conftest import book, login
+from jobs import JobQueue, JobRunner
+from models import Appointment
+
+
+@pytest.fixture
+def queue(tmp_path):
+    return JobQueue(str(tmp_path / "jobs.db"))
+
+
+def rows(q, kind=None):
+    with q._connect() as con:
+        sql = "SELECT kind, status, attempts, run_at, payload, last_error FROM jobs"
+        args = ()
+        if kind:
+            sql, args = sql + " WHERE kind = ?", (kind,)
+        return [
+            dict(zip(("kind", "status", "attempts", "run_at", "payload", "last_error"), r))
+            for r in con.execute(sql, args)
+        ]
+
+
+def make_due(q):
+    with q._connect() as con:
+        con.execute("UPDATE jobs SET run_at = 0 WHERE status = 'PENDING'")
+
+
+def test_retry_with_backoff_then_failed(app, queue, monkeypatch):
+    def boom(db, payload, runner):
+        raise RuntimeError("smtp down")
+
+    monkeypatch.setitem(jobs.HANDLERS, "boom", boom)
+    monkeypatch.setattr(jobs, "JOB_BACKOFF_SECONDS", 10)
+    monkeypatch.setattr(jobs, "JOB_MAX_ATTEMPTS", 3)
+    runner = JobRunner(queue, session_factory=app.state.SessionLocal)
+    queue.enqueue("boom", {})
+
+    for attempt, delay in ((1, 10), (2, 20)):
+        before = time.time()
+        assert runner.run_pending() == 1
+        (job,) = rows(queue)
+        assert (job["status"], job["attempts"]) == ("PENDING", attempt)
+        assert before + delay <= job["run_at"] <= time.time() + delay
+        assert "smtp down" in job["last_error"]
+        assert runner.run_pending() == 0  # noch nicht fällig
+        make_due(queue)
+
+    assert runner.run_pending() == 1
+    assert queue.counts() == {"FAILED": 1}
+    make_due(queue)
+    assert runner.run_pending() == 0
+
+
+def test_completed_jobs_are_deleted(app, client):
+    book(login(app, "anna@praxis.de"))
+    assert app.state.job_runner.run_pending() == 2  # Bestätigung + Praxis
+    # nur die künftige Erinnerung bleibt übrig
+    assert app.state.job_queue.counts() == {"PENDING": 1}
+    assert app.state.job_queue.prune(retention_days=0) == 0
+
+
+def test_requeue_only_expired_leases(queue):
+    queue.enqueue("x", {})
+    job_id = queue.claim()[0]
+    assert queue.requeue_stale(lease_seconds=300) == 0  # Worker läuft noch
+    with queue._connect() as con:
+        con.execute("UPDATE jobs SET claimed_at = ? WHERE id = ?", (time.time() - 301, job_id))
+    assert queue.requeue_stale(lease_seconds=300) == 1
+    assert queue.claim()[3] == 2  # zweiter Versuch
+
+
+def test_reminder_replaced_on_reschedule(app, client):
+    appt = book(login(app, "anna@praxis.de"))
+    q = app.state.job_queue
+    start = datetime.fromisoformat(appt["start_ts_utc"])
+
+    (reminder,) = rows(q, "send_reminder")
+    assert reminder["run_at"] == (start - timedelta(hours=jobs.REMINDER_LEAD_HOURS)).replace(
+        tzinfo=jobs.ZoneInfo("UTC")).timestamp()
+
+    r = client.patch(f"/practice/appointments/{appt['id']}/reschedule",
+                     json={"new_start_ts_iso_local": "2030-01-08 10:00"})
+    assert r.status_code == 200, r.text
+    new_start = datetime.fromisoformat(r.json()["start_ts_utc"])
+
+    (reminder,) = rows(q, "send_reminder")
+    assert json.loads(reminder["payload"])["start_ts_utc"] == new_start.isoformat()
+    assert reminder["run_at"] == (new_start - timedelta(hours=jobs.REMINDER_LEAD_HOURS)).replace(
+        tzinfo=jobs.ZoneInfo("UTC")).timestamp()
+
+    # fällig machen: genau eine Erinnerung, mit dem neuen Termin
+    app.state.job_runner.run_pending()
+    make_due(q)
+    app.state.job_runner.run_pending()
+    reminders = [m for m in app.state.mail_sink.outbox if m["subject"].startswith("Erinnerung")]
+    assert len(reminders) == 1
+    assert "08.01.2030 10:00" in reminders[0]["body"]
+
+
+def test_reminder_dropped_on_cancel(app, client):
+    appt = book(login(app, "anna@praxis.de"))
+    assert len(rows(app.state.job_queue, "send_reminder")) == 1
+    client.patch(f"/practice/appointments/{appt['id']}/cancel")
+    assert rows(app.state.job_queue, "send_reminder") == []
+
+
+def test_enqueue_failure_does_not_break_booking(app, client, monkeypatch, caplog):
+    def locked(*args, **kw):
+        raise sqlite3.OperationalError("database is locked")
+
+    monkeypatch.setattr(app.state.job_queue, "submit", locked)
+    appt = book(login(app, "anna@praxis.de"))  # 200 trotz gesperrter jobs.db
+
+    db = app.state.SessionLocal()
+    assert db.get(Appointment, appt["id"]).status == "BOOKED"
+    db.close()
+    assert "Jobs nicht eingereiht" in caplog.text
+
+    r = client.patch(f"/practice/appointments/{appt['id']}/cancel")
+    assert r.status_code == 200, r.text
+
+
+def test_booking_side_effects_in_one_transaction(app, client, monkeypatch):
+    calls = []
+    submit = app.state.job_queue.submit
+    monkeypatch.setattr(app.state.job_queue, "submit", lambda *a, **kw: calls.append(a) or submit(*a, **kw))
+    book(login(app, "anna@praxis.de"))
+    assert len(calls) == 1
+    assert sorted(s.kind for s in calls[0][0]) == ["notify_practice", "send_confirmation", "send_reminder"]
+
+
+def test_submit_is_all_or_nothing(queue):
+    queue.enqueue("send_reminder", {}, dedupe_key="reminder:1")
+    with pytest.raises(TypeError):
+        queue.submit([jobs.JobSpec("send_confirmation", {}), jobs.JobSpec("broken", {"x": object()})],
+                     cancel=["reminder:1"])
+    assert [j["kind"] for j in rows(queue)] == ["send_reminder"]
@@ -0,0 +1,83 @@
+import threading
+import time
+
+from fastapi.testclient import TestClient
+
+from conftest import book, login, seed
+from database import Base, ReadRouter, make_engine, timeout_connect_args
+from models import Appointment
+
+
+def replica(tmp_path, name, tables=None):
+    url = f"sqlite:///{tmp_path / name}.db"
+    engine = make_engine(url)
+    Base.metadata.create_all(engine, tables=tables)
+    engine.dispose()
+    return url
+
+
+def test_unhealthy_replica_is_skipped(tmp_path, make_app):
+    # leere Datei: SELECT 1 ginge durch, die Schema-Probe nicht
+    app = make_app(replica_urls=(f"sqlite:///{tmp_path / 'empty'}.db",))
+    with TestClient(app, base_url="https://testserver") as c:
+        seed(app)
+        assert app.state.read_router.status() == [False]
+        assert [p["id"] for p in c.get("/public/practices").json()] == ["p"]
+
+
+def test_failing_query_retries_on_primary(tmp_path, make_app):
+    # Replika besteht die Probe, aber die Terminabfrage scheitert (keine appointments-Tabelle)
+    url = replica(tmp_path, "partial", tables=[t for t in Base.metadata.sorted_tables if t.name != "appointments"])
+    app = make_app(replica_urls=(url,))
+    with TestClient(app, base_url="https://testserver") as c:
+        seed(app)
+        book(login(app, "anna@praxis.de"))
+        assert app.state.read_router.status() == [True]
+
+        r = c.get("/practice/appointments", params={"practice_id": "p"})
+        assert r.status_code == 200, r.text
+        assert len(r.json()) == 1
+        assert app.state.read_router.status() == [False]  # bis zur nächsten Probe gemieden
+
+
+def test_sticky_reads_after_write(tmp_path, make_app):
+    # Replika mit Schema, aber ohne Replikation: sieht eigene Buchungen nie
+    url = replica(tmp_path, "lagging")
+    app = make_app(replica_urls=(url,), sticky_seconds=30)
+    with TestClient(app, base_url="https://testserver") as c:
+        seed(app)
+        anna = login(app, "anna@praxis.de")  # POST -> Sticky-Cookie
+        book(anna)
+        assert len(anna.get("/practice/appointments", params={"practice_id": "p"}).json()) == 1
+        # ohne Cookie: von der (veralteten) Replika
+        assert c.get("/practice/appointments", params={"practice_id": "p"}).json() == []
+
+        db = app.state.SessionLocal()
+        assert db.query(Appointment).count() == 1
+        db.close()
+
+
+def test_probe_is_single_flight(tmp_path, monkeypatch):
+    router = ReadRouter(make_engine(f"sqlite:///{tmp_path / 'primary'}.db"), [replica(tmp_path, "slow")], health_ttl=60)
+    probes = []
+
+    def slow_probe(i):
+        probes.append(i)
+        time.sleep(0.2)
+        return False
+
+    monkeypatch.setattr(router, "_probe", slow_probe)
+    started = time.monotonic()
+    threads = [threading.Thread(target=router.is_healthy, args=(0,)) for _ in range(10)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert probes == [0]
+    assert router.is_healthy(0) is False  # Ergebnis gecacht
+    assert time.monotonic() - started < 1
+
+
+def test_replica_connect_timeout():
+    assert timeout_connect_args("postgresql+psycopg2://db/app", 2.5) == {"connect_timeout": 2}
+    assert timeout_connect_args("sqlite:///replica.db", 2.5) == {"timeout": 2.5}
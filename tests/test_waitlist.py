@@ -0,0 +1,214 @@
+import os
+import shutil
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+
+import waitlist
+from conftest import book, login
+from database import make_engine
+from models import Appointment, Practice, Resource, Service, WaitlistDay, WaitlistEntry, migrate_schema
+
+
+def join(c, **extra):
+    payload = {"practice_id": "p", "service_id": "s", "date_from": "2030-01-01", "date_to": "2030-01-31", **extra}
+    r = c.post("/public/waitlist", json=payload)
+    assert r.status_code == 200, r.text
+    return r.json()
+
+
+def cancel(c, appt_id):
+    r = c.patch(f"/practice/appointments/{appt_id}/cancel")
+    assert r.status_code == 200, r.text
+
+
+def entry_status(app, entry_id):
+    db = app.state.SessionLocal()
+    try:
+        return db.get(WaitlistEntry, entry_id).status
+    finally:
+        db.close()
+
+
+def test_priority_then_fifo(app, client):
+    appt = book(login(app, "anna@praxis.de"))
+    first = join(login(app, "bert@praxis.de"))
+    second = join(login(app, "carl@praxis.de"))
+    vip = join(login(app, "dora@praxis.de"))
+    client.patch(f"/practice/waitlist/{vip['id']}/priority", json={"priority": 1})
+
+    cancel(client, appt["id"])
+    assert entry_status(app, vip["id"]) == "OFFERED"
+    assert entry_status(app, first["id"]) == "OPEN"
+
+    # ohne Sonderpriorität: wer zuerst kam
+    appt2 = book(login(app, "emil@praxis.de"), start="2030-01-08 10:00")
+    cancel(client, appt2["id"])
+    assert entry_status(app, first["id"]) == "OFFERED"
+    assert entry_status(app, second["id"]) == "OPEN"
+
+
+def test_cancel_offer_accept(app, client):
+    appt = book(login(app, "anna@praxis.de"))
+    bert = login(app, "bert@praxis.de")
+    entry = join(bert)
+
+    cancel(client, appt["id"])
+    app.state.job_runner.run_pending()
+    assert any(m["to"] == "bert@praxis.de" and "frei geworden" in m["subject"] for m in app.state.mail_sink.outbox)
+
+    r = bert.patch(f"/public/waitlist/{entry['id']}/accept")
+    assert r.status_code == 200, r.text
+    assert r.json()["start_ts_utc"] == appt["start_ts_utc"]
+    assert entry_status(app, entry["id"]) == "BOOKED"
+
+
+def test_decline_chain(app, client):
+    appt = book(login(app, "anna@praxis.de"))
+    bert, carl = login(app, "bert@praxis.de"), login(app, "carl@praxis.de")
+    eb, ec = join(bert), join(carl, auto_book=True)
+
+    cancel(client, appt["id"])
+    assert entry_status(app, eb["id"]) == "OFFERED"
+
+    r = bert.patch(f"/public/waitlist/{eb['id']}/decline")
+    assert r.json()["status"] == "OPEN"
+    assert entry_status(app, ec["id"]) == "BOOKED"
+
+    db = app.state.SessionLocal()
+    assert db.query(WaitlistDay).filter(WaitlistDay.entry_id == eb["id"]).count() == 31  # wieder indiziert
+    assert db.query(WaitlistDay).filter(WaitlistDay.entry_id == ec["id"]).count() == 0
+    db.close()
+
+
+def test_offer_expiry_moves_on(app, client):
+    appt = book(login(app, "anna@praxis.de"))
+    eb = join(login(app, "bert@praxis.de"))
+    ec = join(login(app, "carl@praxis.de"))
+    cancel(client, appt["id"])
+
+    # Ablauf vorziehen und fälligen Job ausführen
+    db = app.state.SessionLocal()
+    db.get(WaitlistEntry, eb["id"]).offer_expires_at = datetime.utcnow() - timedelta(minutes=1)
+    db.commit()
+    db.close()
+    with app.state.job_queue._connect() as con:
+        con.execute("UPDATE jobs SET run_at = 0 WHERE kind = 'expire_waitlist_offer'")
+    app.state.job_runner.run_pending()
+
+    assert entry_status(app, eb["id"]) == "OPEN"
+    assert entry_status(app, ec["id"]) == "OFFERED"
+
+
+def test_legacy_schema_cancel_backfill_accept(legacy_app):
+    # altes app.db: UNIQUE (resource_id, start_ts_utc, end_ts_utc) zählte auch Stornos
+    with TestClient(legacy_app, base_url="https://testserver") as client:
+        db = legacy_app.state.SessionLocal()
+        ids = {
+            "practice_id": db.query(Practice.id).scalar(),
+            "resource_id": db.query(Resource.id).scalar(),
+            "service_id": db.query(Service.id).scalar(),
+        }
+        db.close()
+        appt = book(login(legacy_app, "anna@praxis.de"), **ids)
+        bert, carl = login(legacy_app, "bert@praxis.de"), login(legacy_app, "carl@praxis.de")
+        eb = join(bert, practice_id=ids["practice_id"], service_id=ids["service_id"])
+        ec = join(carl, practice_id=ids["practice_id"], service_id=ids["service_id"], auto_book=True)
+        r = client.patch(f"/practice/waitlist/{ec['id']}/priority", json={"priority": 1})
+        assert r.status_code == 200, r.text
+
+        # auto_book: direkt gebucht, obwohl die stornierte Zeile denselben Slot belegt
+        cancel(client, appt["id"])
+        assert entry_status(legacy_app, ec["id"]) == "BOOKED"
+
+        # erneut frei -> Angebot an bert, Annahme auf demselben Slot
+        db = legacy_app.state.SessionLocal()
+        auto = db.get(WaitlistEntry, ec["id"]).appointment_id
+        db.close()
+        cancel(client, auto)
+        assert entry_status(legacy_app, eb["id"]) == "OFFERED"
+        r = bert.patch(f"/public/waitlist/{eb['id']}/accept")
+        assert r.status_code == 200, r.text
+
+        db = legacy_app.state.SessionLocal()
+        rows = db.query(Appointment.status).filter(
+            Appointment.resource_id == ids["resource_id"],
+            Appointment.start_ts_utc == datetime.fromisoformat(appt["start_ts_utc"]),
+        ).all()
+        db.close()
+        assert sorted(s for (s,) in rows) == ["BOOKED", "CANCELLED", "CANCELLED"]
+
+        # Doppelbuchung bleibt verboten
+        r = login(legacy_app, "dora@praxis.de").post("/public/appointments", json={
+            **ids, "start_ts_iso_local": "2030-01-07 10:00", "patient_email": "d@praxis.de", "patient_name": "D",
+        })
+        assert r.status_code == 409
+
+
+def test_reschedule_into_overlap_does_not_double_book(app, client):
+    appt = book(login(app, "anna@praxis.de"))
+    join(login(app, "bert@praxis.de"), auto_book=True)
+
+    # 10:00 -> 10:30: der alte Slot ist nur teilweise frei geworden
+    r = client.patch(f"/practice/appointments/{appt['id']}/reschedule",
+                     json={"new_start_ts_iso_local": "2030-01-07 10:30"})
+    assert r.status_code == 200, r.text
+
+    db = app.state.SessionLocal()
+    booked = db.query(Appointment).filter(Appointment.resource_id == "r", Appointment.status == "BOOKED").all()
+    db.close()
+    assert [a.id for a in booked] == [appt["id"]]
+
+
+def test_waitlist_error_does_not_block_cancel(app, client, monkeypatch):
+    appt = book(login(app, "anna@praxis.de"))
+    join(login(app, "bert@praxis.de"))
+
+    def broken(*args, **kw):
+        raise RuntimeError("database is locked")
+
+    monkeypatch.setattr(waitlist, "find_match", broken)
+    r = client.patch(f"/practice/appointments/{appt['id']}/cancel")
+    assert r.status_code == 200, r.text
+    assert r.json()["status"] == "CANCELLED"
+
+
+def _legacy_engine(tmp_path):
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    shutil.copy(os.path.join(root, "app.db"), tmp_path / "legacy.db")
+    return make_engine(f"sqlite:///{tmp_path / 'legacy.db'}")
+
+
+def _tables(engine):
+    with engine.connect() as con:
+        return dict(con.exec_driver_sql("SELECT name, sql FROM sqlite_master WHERE type = 'table'").all())
+
+
+def test_legacy_rebuild_is_atomic(tmp_path):
+    engine = _legacy_engine(tmp_path)
+
+    def fail_copy(conn, cursor, statement, *args):
+        if statement.startswith("INSERT INTO appointments__new"):
+            raise RuntimeError("disk I/O error")
+
+    event.listen(engine, "before_cursor_execute", fail_copy)
+    with pytest.raises(RuntimeError):
+        migrate_schema(engine)
+    event.remove(engine, "before_cursor_execute", fail_copy)
+
+    tables = _tables(engine)
+    assert "appointments__new" not in tables
+    assert "uq_no_double_booking" in tables["appointments"]
+
+    # Rest eines abgebrochenen Laufs blockiert den nächsten Start nicht
+    with engine.begin() as con:
+        con.exec_driver_sql("CREATE TABLE appointments__new (id VARCHAR)")
+    migrate_schema(engine)
+    migrate_schema(engine)
+    tables = _tables(engine)
+    assert "appointments__new" not in tables
+    assert "uq_no_double_booking" not in tables["appointments"]
+    with engine.connect() as con:
+        assert con.exec_driver_sql("SELECT COUNT(*) FROM appointments").scalar() == 4
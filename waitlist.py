@@ -0,0 +1,229 @@
+# waitlist.py
+#
+# Warteliste und automatisches Nachrücken bei Storno/Verschiebung.
+# Alle Funktionen arbeiten in der Transaktion des Aufrufers (kein commit hier),
+# damit das Freigeben und das Neuvergeben eines Slots atomar sind.
+import os
+import uuid
+import logging
+from datetime import date, datetime, timedelta
+from typing import Iterable, Optional
+from zoneinfo import ZoneInfo
+
+from sqlalchemy import or_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from models import Appointment, Practice, WaitlistDay, WaitlistEntry
+
+log = logging.getLogger("praxisnow.waitlist")
+
+WAITLIST_MAX_DAYS = int(os.getenv("WAITLIST_MAX_DAYS", "60"))
+WAITLIST_OFFER_HOURS = int(os.getenv("WAITLIST_OFFER_HOURS", "12"))
+
+
+def _days(entry: WaitlistEntry) -> Iterable[date]:
+    d = entry.date_from
+    while d <= entry.date_to:
+        yield d
+        d += timedelta(days=1)
+
+
+def index_entry(db: Session, entry: WaitlistEntry) -> None:
+    """Trägt einen OPEN-Eintrag für jeden Tag seines Zeitraums in den Index ein."""
+    created_at = entry.created_at or datetime.utcnow()
+    entry.created_at = created_at
+    db.add_all(
+        WaitlistDay(
+            entry_id=entry.id,
+            day=d,
+            practice_id=entry.practice_id,
+            service_id=entry.service_id,
+            resource_id=entry.resource_id,
+            priority=entry.priority,
+            created_at=created_at,
+        )
+        for d in _days(entry)
+    )
+
+
+def unindex_entry(db: Session, entry: WaitlistEntry) -> None:
+    db.query(WaitlistDay).filter(WaitlistDay.entry_id == entry.id).delete(synchronize_session=False)
+
+
+def add_entry(db: Session, entry: WaitlistEntry) -> None:
+    db.add(entry)
+    index_entry(db, entry)
+
+
+def set_priority(db: Session, entry: WaitlistEntry, priority: int) -> None:
+    entry.priority = priority
+    if entry.status == "OPEN":
+        db.query(WaitlistDay).filter(WaitlistDay.entry_id == entry.id).update(
+            {WaitlistDay.priority: priority}, synchronize_session=False
+        )
+
+
+def cancel_entry(db: Session, entry: WaitlistEntry) -> None:
+    unindex_entry(db, entry)
+    entry.status = "CANCELLED"
+
+
+def find_match(
+    db: Session,
+    practice_id: str,
+    service_id: str,
+    resource_id: str,
+    day: date,
+    exclude_ids: Iterable[str] = (),
+) -> Optional[WaitlistEntry]:
+    """Bester offener Eintrag für einen freien Slot an `day` (Priorität, dann FIFO)."""
+    q = (
+        db.query(WaitlistEntry)
+        .join(WaitlistDay, WaitlistDay.entry_id == WaitlistEntry.id)
+        .filter(
+            WaitlistDay.practice_id == practice_id,
+            WaitlistDay.service_id == service_id,
+            WaitlistDay.day == day,
+            or_(WaitlistDay.resource_id.is_(None), WaitlistDay.resource_id == resource_id),
+        )
+    )
+    exclude_ids = list(exclude_ids)
+    if exclude_ids:
+        q = q.filter(WaitlistDay.entry_id.notin_(exclude_ids))
+    return (
+        q.order_by(WaitlistDay.priority.asc(), WaitlistDay.created_at.asc())
+        # parallele Stornos (Postgres) sollen nicht denselben Eintrag vergeben
+        .with_for_update(skip_locked=True, of=WaitlistEntry)
+        .first()
+    )
+
+
+def slot_is_free(db: Session, resource_id: str, start_utc: datetime, end_utc: datetime) -> bool:
+    """Keine BOOKED-Buchung der Ressource überlappt [start_utc, end_utc) –
+    z.B. der eigene, nur um 30 Minuten verschobene Termin."""
+    return not db.query(Appointment.id).filter(
+        Appointment.resource_id == resource_id,
+        Appointment.start_ts_utc < end_utc,
+        Appointment.end_ts_utc > start_utc,
+        Appointment.status == "BOOKED",
+    ).first()
+
+
+def book_entry(
+    db: Session,
+    entry: WaitlistEntry,
+    resource_id: str,
+    start_utc: datetime,
+    end_utc: datetime,
+) -> Optional[Appointment]:
+    """Bucht den Slot für den Eintrag. None, wenn die DB die Buchung ablehnt."""
+    appt = Appointment(
+        id=str(uuid.uuid4()),
+        practice_id=entry.practice_id,
+        resource_id=resource_id,
+        service_id=entry.service_id,
+        patient_email=entry.patient_email,
+        patient_name=entry.patient_name,
+        start_ts_utc=start_utc,
+        end_ts_utc=end_utc,
+        status="BOOKED",
+        source="WAITLIST",
+        user_id=entry.user_id,
+    )
+    db.flush()  # nur die neue Buchung soll im Savepoint landen
+    try:
+        # Savepoint: schlägt uq_appointments_booked_slot zu (paralleler Buchung),
+        # bleibt der Rest der Transaktion des Aufrufers intakt
+        with db.begin_nested():
+            db.add(appt)
+    except IntegrityError:
+        return None
+    unindex_entry(db, entry)
+    entry.status = "BOOKED"
+    entry.appointment_id = appt.id
+    entry.offer_resource_id = resource_id
+    entry.offer_start_ts_utc = start_utc
+    entry.offer_end_ts_utc = end_utc
+    entry.offer_expires_at = None
+    return appt
+
+
+def backfill(
+    db: Session,
+    practice_id: str,
+    service_id: str,
+    resource_id: str,
+    start_utc: datetime,
+    end_utc: datetime,
+    exclude_ids: Iterable[str] = (),
+) -> Optional[WaitlistEntry]:
+    """Vergibt einen frei gewordenen Slot an den besten Wartelisten-Eintrag.
+
+    Bei auto_book wird direkt gebucht (Status BOOKED), sonst wird der Slot
+    angeboten (Status OFFERED, gültig bis offer_expires_at). Liefert den
+    betroffenen Eintrag oder None.
+    """
+    db.flush()  # Storno/Verschiebung des Aufrufers muss für die Abfragen sichtbar sein
+    now = datetime.utcnow()
+    if start_utc <= now or not slot_is_free(db, resource_id, start_utc, end_utc):
+        return None
+    p = db.query(Practice).filter(Practice.id == practice_id).first()
+    tz = ZoneInfo((p.time_zone if p else None) or "Europe/Berlin")
+    day = start_utc.replace(tzinfo=ZoneInfo("UTC")).astimezone(tz).date()
+
+    entry = find_match(db, practice_id, service_id, resource_id, day, exclude_ids)
+    if entry is None:
+        return None
+    if entry.auto_book:
+        # lehnt die DB die Buchung ab, ist der Slot nicht frei -> auch nicht anbieten
+        return entry if book_entry(db, entry, resource_id, start_utc, end_utc) else None
+
+    unindex_entry(db, entry)
+    entry.status = "OFFERED"
+    entry.offer_resource_id = resource_id
+    entry.offer_start_ts_utc = start_utc
+    entry.offer_end_ts_utc = end_utc
+    entry.offer_expires_at = min(now + timedelta(hours=WAITLIST_OFFER_HOURS), start_utc)
+    return entry
+
+
+def backfill_isolated(
+    db: Session,
+    practice_id: str,
+    service_id: str,
+    resource_id: str,
+    start_utc: datetime,
+    end_utc: datetime,
+) -> Optional[WaitlistEntry]:
+    """backfill() in einem eigenen Savepoint: ein Fehler der Warteliste wird geloggt
+    und verworfen, das Storno/die Verschiebung des Aufrufers bleibt bestehen."""
+    try:
+        with db.begin_nested():
+            return backfill(db, practice_id, service_id, resource_id, start_utc, end_utc)
+    except Exception:
+        log.exception("Nachrücken für %s %s fehlgeschlagen", resource_id, start_utc)
+        return None
+
+
+def release_offer(db: Session, entry: WaitlistEntry, reopen: bool = True) -> Optional[WaitlistEntry]:
+    """Angebot abgelehnt/abgelaufen: Slot weitergeben und den Eintrag wieder öffnen
+    (reopen=False, wenn der Eintrag anschließend storniert wird).
+
+    Liefert den Eintrag, der den Slot als Nächstes bekommt (oder None).
+    """
+    if entry.status != "OFFERED":
+        return None
+    resource_id, start_utc, end_utc = entry.offer_resource_id, entry.offer_start_ts_utc, entry.offer_end_ts_utc
+    entry.status = "OPEN"
+    entry.offer_resource_id = None
+    entry.offer_start_ts_utc = None
+    entry.offer_end_ts_utc = None
+    entry.offer_expires_at = None
+    nxt = backfill(
+        db, entry.practice_id, entry.service_id, resource_id, start_utc, end_utc,
+        exclude_ids=[entry.id],
+    )
+    if reopen:
+        index_entry(db, entry)
+    return nxt